@@ -2,9 +2,11 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 
 from .config import Config
-from .extensions import db, migrate, jwt, bcrypt
+from .cli import register_cli
+from .extensions import db, migrate, sqlite_mode, slow_query_log, jwt, permissions, bcrypt, audit_writer, compress, user_events, email_filter, password_denylist, profiler, load_shedder
 from .auth.routes import auth_bp
 from .users.routes import users_bp
+from .batch.routes import batch_bp
 
 
 def create_app(config_class: type[Config] = Config) -> Flask:
@@ -12,14 +14,28 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     app.config.from_object(config_class)
 
     CORS(app, resources={r"/api/*": {"origins": app.config.get("CORS_ORIGINS", "*")}})
+    # Shed load before any other hook does work for a request we will refuse.
+    load_shedder.init_app(app)
+    # Registered early so its after_request runs last and the profile covers the other hooks.
+    profiler.init_app(app)
 
     db.init_app(app)
     migrate.init_app(app, db)
+    sqlite_mode.init_app(app, db)
+    slow_query_log.init_app(app)
     jwt.init_app(app)
+    permissions.init_app(app)
     bcrypt.init_app(app)
+    audit_writer.init_app(app)
+    compress.init_app(app)
+    user_events.init_app(app)
+    email_filter.init_app(app)
+    password_denylist.init_app(app)
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(users_bp, url_prefix="/api")
+    app.register_blueprint(batch_bp, url_prefix="/api/batch")
+    register_cli(app)
 
     @app.route("/health")
     def health():
@@ -3,8 +3,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from ..services import auth_service
 from ..models.user import User
-from ..extensions import db
-from ..schemas.auth import SignupInput, LoginInput
+from ..extensions import jwt
+from ..schemas.auth import SignupInput, LoginInput, validate_email
+from ..schemas.user import parse_fields
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -27,6 +28,15 @@ def signup():
         return jsonify({"error": {"code": "auth_error", "message": str(err)}}), 400
 
 
+@auth_bp.route("/email-available", methods=["GET"])
+def email_available():
+    try:
+        email = validate_email(request.args.get("email", ""))
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
+    return jsonify({"email": email, "available": not auth_service.is_email_registered(email)})
+
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     try:
@@ -43,15 +53,21 @@ def login():
 @auth_bp.route("/me", methods=["GET"])
 @jwt_required()
 def me():
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
     user_id = get_jwt_identity()
-    user = db.session.get(User, user_id)
+    user = User.get_live(user_id)
     if not user:
         return jsonify({"error": {"code": "not_found", "message": "User not found"}}), 404
-    return jsonify(user.to_dict())
+    return jsonify(user.to_dict(fields))
 
 
 @auth_bp.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
     # JWT is stateless; client should drop token. Endpoint kept for parity with frontend.
+    # Free this worker's decode-cache slot; revocation proper needs a blocklist loader.
+    jwt.token_cache.invalidate(request.headers.get("Authorization", "").removeprefix("Bearer "))
     return jsonify({"message": "Logged out"})
@@ -0,0 +1,62 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from ..extensions import db
+from ..schemas.batch import BatchInput
+
+
+batch_bp = Blueprint("batch", __name__)
+
+# Set on sub-request environs so request hooks can tell them apart from real HTTP requests.
+BATCH_ENVIRON_KEY = "userdashboard.batch"
+_NESTED_ERROR = {"error": {"code": "validation_error", "message": "Batches cannot be nested"}}
+_STREAMED_ERROR = {"error": {"code": "validation_error", "message": "Streaming endpoints cannot be batched"}}
+
+
+def _dispatch(sub, authorization: str):
+    app = current_app._get_current_object()
+    # Nested request contexts reuse the current app context, so every sub-request sees
+    # the same flask.g (verified JWT) and the same db.session (identity map, connection).
+    with app.test_request_context(
+        sub.path,
+        method=sub.method,
+        json=sub.body,
+        headers={"Authorization": authorization},
+        environ_base={"REMOTE_ADDR": request.remote_addr, BATCH_ENVIRON_KEY: True},
+    ):
+        # Decided on the matched route, not the path text: a fragment or other spelling
+        # can still reach the same view, and a nested batch would fan out without bound.
+        if request.url_rule is not None and request.url_rule.endpoint == "batch.batch":
+            return {"id": sub.id, "status": 400, "body": _NESTED_ERROR}
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("Batch sub-request %s %s failed", sub.method, sub.path)
+            return {"id": sub.id, "status": 500, "body": {"error": {"code": "server_error", "message": "Unexpected error"}}}
+    # Closing runs the view's call_on_close hooks (an event stream's subscription, for one),
+    # which a real server would do once the body was sent.
+    try:
+        # Reading a stream would hold the whole batch open until it ends.
+        if response.is_streamed:
+            return {"id": sub.id, "status": 400, "body": _STREAMED_ERROR}
+        body = response.get_json(silent=True)
+        if body is None:
+            body = response.get_data(as_text=True)
+        return {"id": sub.id, "status": response.status_code, "body": body}
+    finally:
+        response.close()
+
+
+@batch_bp.route("", methods=["POST"])
+@jwt_required()
+def batch():
+    if request.environ.get(BATCH_ENVIRON_KEY):
+        return jsonify(_NESTED_ERROR), 400
+    try:
+        payload = BatchInput.from_json(request.get_json(force=True), current_app.config["BATCH_MAX_REQUESTS"])
+    except Exception as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
+
+    authorization = request.headers.get("Authorization", "")
+    return jsonify({"responses": [_dispatch(sub, authorization) for sub in payload.requests]})
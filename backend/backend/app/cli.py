@@ -0,0 +1,110 @@
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+
+from .core.password_denylist import build_denylist
+from .services import archive_service, stats_service
+
+
+stats_cli = AppGroup("stats", help="Maintain the user_stats aggregates.")
+
+
+@stats_cli.command("rebuild")
+def rebuild_stats():
+    """Recompute user counters from the users table."""
+    stats_service.rebuild()
+    click.echo("User stats rebuilt.")
+
+
+users_cli = AppGroup("users", help="User maintenance tasks.")
+
+
+@users_cli.command("archive")
+@click.option("--inactive-days", type=int, default=None, help="Archive users inactive for this long (default: ARCHIVE_INACTIVE_DAYS).")
+@click.option("--batch-size", type=int, default=500, show_default=True)
+@click.option("--interval", type=int, default=0, help="Repeat every N seconds instead of running once.")
+def archive_users(inactive_days, batch_size, interval):
+    """Move soft-deleted and long-inactive users into users_archive."""
+    if inactive_days is None:
+        inactive_days = current_app.config["ARCHIVE_INACTIVE_DAYS"]
+    while True:
+        moved = archive_service.archive_users(inactive_days, batch_size)
+        click.echo(f"Archived {moved} users.")
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+passwords_cli = AppGroup("passwords", help="Breached-password denylist.")
+
+
+@passwords_cli.command("build")
+@click.argument("source", type=click.File("rb"))
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="Target file (default: PASSWORD_DENYLIST_PATH).")
+@click.option("--sha1", is_flag=True, help="Input lines are SHA1[:count] hashes, as in the Have I Been Pwned dumps.")
+def build_password_denylist(source, output, sha1):
+    """Compile a password list into the sorted hash file used at signup."""
+    from .extensions import password_denylist
+
+    output = output or password_denylist.path
+    count = build_denylist(source, output, sha1=sha1)
+    click.echo(f"Wrote {count} password hashes to {output}. Restart workers to pick it up.")
+
+
+profile_cli = AppGroup("profile", help="On-demand request profiling.")
+
+
+@profile_cli.command("token")
+@click.option("--ttl", type=int, default=900, show_default=True, help="Seconds the token stays valid.")
+def profile_token(ttl):
+    """Mint a signed value for the PROFILE_HEADER request header."""
+    from .extensions import profiler
+
+    header = current_app.config["PROFILE_HEADER"]
+    click.echo(f"{header}: {profiler.make_token(current_app, ttl)}")
+
+
+queries_cli = AppGroup("queries", help="Slow query log.")
+
+SORT_KEYS = {"total": "total_ms", "p95": "p95_ms", "p99": "p99_ms", "max": "max_ms", "count": "count", "slow": "slow"}
+
+
+@queries_cli.command("top")
+@click.option("-n", "--limit", type=int, default=10, show_default=True)
+@click.option("--sort", type=click.Choice(list(SORT_KEYS)), default="total", show_default=True)
+@click.option("--plans", is_flag=True, help="Print captured EXPLAIN plans.")
+def top_queries(limit, sort, plans):
+    """Show the statements that cost the most, merged across all workers' snapshots."""
+    from .extensions import slow_query_log
+
+    rows = slow_query_log.top(limit, SORT_KEYS[sort], include_snapshots=True)
+    if not rows:
+        click.echo("No queries recorded.")
+        return
+    click.echo(f"{'id':<12} {'count':>8} {'slow':>6} {'total ms':>10} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  statement")
+    for row in rows:
+        click.echo(
+            f"{row['id']:<12} {row['count']:>8} {row['slow']:>6} {row['total_ms']:>10.1f} {row['mean_ms']:>8.2f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}  {row['fingerprint'][:120]}"
+        )
+        if plans and row["plan"]:
+            click.echo("\n".join("    " + line for line in row["plan"].splitlines()))
+
+
+@queries_cli.command("reset")
+def reset_queries():
+    """Delete all workers' snapshots and start aggregating afresh."""
+    from .extensions import slow_query_log
+
+    removed = slow_query_log.clear_snapshots()
+    click.echo(f"Removed {removed} snapshot files.")
+
+
+def register_cli(app: Flask) -> None:
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(passwords_cli)
+    app.cli.add_command(profile_cli)
+    app.cli.add_command(queries_cli)
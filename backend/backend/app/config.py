@@ -6,9 +6,108 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every connection of a file-backed SQLite database (ignored on PostgreSQL)
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    }
+    # Start transactions deferred and switch to BEGIN IMMEDIATE at the first write (see core/sqlite.py)
+    SQLITE_IMMEDIATE_WRITES = os.environ.get("SQLITE_IMMEDIATE_WRITES", "true").lower() == "true"
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "jwt-secret")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=6)
+    # Max verified tokens memoized per worker; 0 disables the decode cache
+    JWT_DECODE_CACHE_SIZE = int(os.environ.get("JWT_DECODE_CACHE_SIZE", 1024))
+    # Role -> permission names (see core/permissions.py), compiled to integer bitmasks at startup
+    ROLE_PERMISSIONS = {
+        "admin": (
+            "users:list",
+            "users:stats",
+            "users:events",
+            "users:manage",
+            "users:delete",
+            "users:restore",
+            "audit:read",
+        ),
+        "user": (),
+    }
+    # Seconds a worker reuses a user's permission mask; status changes in the same worker apply at once
+    PERMISSION_CACHE_SECONDS = int(os.environ.get("PERMISSION_CACHE_SECONDS", 30))
+    PERMISSION_CACHE_SIZE = 4096
     CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:5173")
+    # Seconds a worker reuses the exact /api/users total before recounting
+    USER_COUNT_CACHE_TTL = int(os.environ.get("USER_COUNT_CACHE_TTL", 30))
+    # Inactive users untouched for this many days are moved to users_archive by `flask users archive`
+    ARCHIVE_INACTIVE_DAYS = int(os.environ.get("ARCHIVE_INACTIVE_DAYS", 180))
+    # Per-worker Bloom filter of registered emails, checked before bcrypt on signup
+    EMAIL_FILTER_CAPACITY = int(os.environ.get("EMAIL_FILTER_CAPACITY", 1_000_000))
+    EMAIL_FILTER_ERROR_RATE = 0.01
+    EMAIL_FILTER_REFRESH_SECONDS = int(os.environ.get("EMAIL_FILTER_REFRESH_SECONDS", 60))
+    # Full rebuilds bound how long a row committed late (after the refresh window) can be missed
+    EMAIL_FILTER_REBUILD_SECONDS = int(os.environ.get("EMAIL_FILTER_REBUILD_SECONDS", 3600))
+    # Build and refresh the filter on a per-worker thread; when off, requests sync it inline
+    EMAIL_FILTER_BACKGROUND = True
+    # Sorted breached-password key file built by `flask passwords build` (default: instance/breached_passwords.bin)
+    PASSWORD_DENYLIST_PATH = os.environ.get("PASSWORD_DENYLIST_PATH")
+    # Slow query log: every statement is timed per fingerprint; those over the threshold are logged,
+    # and on PostgreSQL SLOW_QUERY_EXPLAIN captures one EXPLAIN (ANALYZE, BUFFERS) per slow SELECT fingerprint
+    SLOW_QUERY_LOG_ENABLED = os.environ.get("SLOW_QUERY_LOG_ENABLED", "true").lower() == "true"
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+    SLOW_QUERY_MAX_FINGERPRINTS = 500
+    SLOW_QUERY_SAMPLE_SIZE = 128
+    SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 5000
+    # Workers write their aggregates here for `flask queries top` (default instance/slow_queries)
+    SLOW_QUERY_DIR = os.environ.get("SLOW_QUERY_DIR")
+    SLOW_QUERY_SNAPSHOT_SECONDS = int(os.environ.get("SLOW_QUERY_SNAPSHOT_SECONDS", 60))
+    # Adaptive per-worker concurrency limits per endpoint class; excess requests get a fast 503.
+    # Limits are (initial, min, max) in-flight requests; /health and unlisted endpoints are never shed.
+    LOAD_SHED_ENABLED = os.environ.get("LOAD_SHED_ENABLED", "true").lower() == "true"
+    LOAD_SHED_CLASSES = {
+        "auth-hashing": ("auth.signup", "auth.login", "users.update_password"),
+        "admin-list": ("users.list_users", "users.user_stats", "users.user_audit_events"),
+        "profile-read": ("users.profile", "auth.me"),
+    }
+    LOAD_SHED_LIMITS = {
+        "auth-hashing": (2, 1, 8),
+        "admin-list": (4, 1, 16),
+        "profile-read": (8, 2, 32),
+    }
+    LOAD_SHED_TOLERANCE = 2.0
+    LOAD_SHED_RETRY_AFTER = 1
+    # Per-request profiling: requests carrying a `flask profile token` value in PROFILE_HEADER,
+    # plus a random PROFILE_SAMPLE_RATE fraction, write folded stacks to PROFILE_DIR (default instance/profiles)
+    PROFILE_HEADER = "X-Profile-Token"
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+    PROFILE_SAMPLE_INTERVAL = 0.005
+    PROFILE_DIR = os.environ.get("PROFILE_DIR")
+    # Response compression; encodings are tried in this order (br/zstd need the brotli/zstandard packages)
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+    COMPRESS_ALGORITHMS = ("br", "zstd", "gzip")
+    COMPRESS_MIMETYPES = ("application/json", "text/plain", "text/csv", "text/html")
+    # Live user events (SSE): "local" fans out within one worker, "postgres" uses LISTEN/NOTIFY across workers
+    EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "local")
+    EVENTS_QUEUE_SIZE = 100
+    EVENTS_HEARTBEAT_SECONDS = 15
+    EVENTS_STREAM_MAX_SECONDS = int(os.environ.get("EVENTS_STREAM_MAX_SECONDS", 300))
+    # Open streams per worker; each holds a gthread thread, so keep this well under --threads
+    EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", 4))
+    EVENTS_RETRY_AFTER = 30
+    # Sub-requests accepted by POST /api/batch
+    BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", 10))
+    # Audit events are queued and written in batches by a background thread
+    AUDIT_ASYNC = True
+    AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 100))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1.0))
+    AUDIT_ENQUEUE_TIMEOUT = 0.05
+    # Retries for a failed audit INSERT before the batch is logged and dropped
+    AUDIT_WRITE_RETRIES = 2
     DEBUG = False
     TESTING = False
 
@@ -28,3 +127,6 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    AUDIT_ASYNC = False
+    EMAIL_FILTER_BACKGROUND = False
+    SLOW_QUERY_SNAPSHOT_SECONDS = 0
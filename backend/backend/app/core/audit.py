@@ -0,0 +1,152 @@
+import atexit
+import json
+import queue
+import threading
+import time
+
+from flask import Flask
+from sqlalchemy import insert
+
+from . import typing as t
+
+_STOP = object()
+
+
+class AuditWriter:
+    """Batches audit rows in a bounded in-process queue and writes them off the request path.
+
+    A daemon thread flushes with one multi-row INSERT when ``AUDIT_BATCH_SIZE``
+    rows are queued or ``AUDIT_FLUSH_INTERVAL`` seconds after the first queued
+    row, whichever comes first. When the queue is full, producers wait up to
+    ``AUDIT_ENQUEUE_TIMEOUT`` and then write inline, so backpressure never
+    drops events. A failed INSERT is retried ``AUDIT_WRITE_RETRIES`` times;
+    if the database still refuses it, the batch is logged in full at ERROR
+    and dropped, and the log is the only record of those events.
+    """
+
+    def __init__(self):
+        self.app: t.Optional[Flask] = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: t.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    def init_app(self, app: Flask) -> None:
+        # Tests build several apps in one process; drain anything bound to the previous one.
+        self.shutdown()
+        self.app = app
+        self.async_enabled = app.config.get("AUDIT_ASYNC", True)
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", 100)
+        self.flush_interval = app.config.get("AUDIT_FLUSH_INTERVAL", 1.0)
+        self.enqueue_timeout = app.config.get("AUDIT_ENQUEUE_TIMEOUT", 0.05)
+        self.write_retries = app.config.get("AUDIT_WRITE_RETRIES", 2)
+        self._queue = queue.Queue(maxsize=app.config.get("AUDIT_QUEUE_SIZE", 10000))
+        app.extensions["audit_writer"] = self
+
+    def submit(self, row: dict) -> None:
+        if not self.async_enabled:
+            self._write([row])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Backpressure: the writer is behind, so this request pays for a batch itself.
+            self._write([row] + self._drain(self.batch_size - 1))
+
+    def flush(self) -> None:
+        """Block until every queued row has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+            return
+        rows = self._drain()
+        if rows:
+            self._write(rows)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        rows = self._drain()
+        if rows and self.app is not None:
+            self._write(rows)
+
+    def _ensure_started(self) -> None:
+        # Started lazily so CLI commands and pre-fork imports never spawn the thread.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _drain(self, limit: t.Optional[int] = None) -> list:
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if item is not _STOP:
+                rows.append(item)
+        return rows
+
+    def _write(self, rows: list) -> None:
+        from ..extensions import db
+        from ..models.audit_event import AuditEvent
+
+        for attempt in range(self.write_retries + 1):
+            try:
+                with self.app.app_context():
+                    # Own connection and transaction: never piggyback on a request's session.
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(AuditEvent).values(rows))
+                return
+            except Exception:
+                if attempt == self.write_retries:
+                    self.app.logger.exception("Failed to write %d audit events", len(rows))
+                    break
+                self.app.logger.warning("Failed to write %d audit events; retrying", len(rows), exc_info=True)
+                time.sleep(0.1 * 2 ** attempt)
+        self.app.logger.error(
+            "Dropped %d audit events after %d attempts: %s",
+            len(rows),
+            self.write_retries + 1,
+            json.dumps(rows, default=str),
+        )
@@ -0,0 +1,36 @@
+import time
+from threading import Lock
+
+from . import typing as t
+
+
+class TTLValue:
+    """A single cached value that expires ``ttl`` seconds after loading or on ``invalidate()``.
+
+    Per-worker only: other workers see a change once their own copy expires.
+    A load that was already running when ``invalidate()`` was called may have
+    read the old state, so its result is returned but not cached.
+    """
+
+    def __init__(self):
+        self._value: t.Any = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = Lock()
+
+    def get(self, loader: t.Any, ttl: float) -> t.Any:
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._value
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + ttl
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._expires_at = 0.0
@@ -0,0 +1,144 @@
+import zlib
+
+from flask import Flask, Response, current_app, request
+
+from . import typing as t
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits=31 -> gzip container rather than raw zlib
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._obj.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._obj.process(chunk)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._obj.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encoders() -> dict:
+    encoders = {"gzip": _Gzip}
+    if brotli is not None:
+        encoders["br"] = _Brotli
+    if zstandard is not None:
+        encoders["zstd"] = _Zstd
+    return encoders
+
+
+class _CompressedStream:
+    """Wraps a streamed body, compressing and flushing each chunk as the view yields it."""
+
+    def __init__(self, iterable: t.Any, compressor: t.Any):
+        self._iterable = iterable
+        self._compressor = compressor
+
+    def __iter__(self):
+        compressor = self._compressor
+        for chunk in self._iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            # Sync-flush so the client gets this chunk now, not when the encoder's window fills.
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+    def close(self) -> None:
+        # The WSGI server only knows about this wrapper; pass close() through to the
+        # view's iterable so its cleanup runs even if iteration never started.
+        close = getattr(self._iterable, "close", None)
+        if close is not None:
+            close()
+
+
+class Compress:
+    """Response compression with gzip, brotli or zstd, chosen from Accept-Encoding.
+
+    Buffered responses are compressed in one pass when at least
+    ``COMPRESS_MIN_SIZE`` bytes. Streamed responses are compressed chunk by chunk
+    as they are produced, never buffered, so the size threshold does not apply.
+    """
+
+    def init_app(self, app: Flask) -> None:
+        app.after_request(self.after_request)
+
+    def _choose(self, config: dict) -> t.Optional[str]:
+        encoders = available_encoders()
+        for name in config["COMPRESS_ALGORITHMS"]:
+            if name in encoders and request.accept_encodings[name] > 0:
+                return name
+        return None
+
+    def after_request(self, response: Response) -> Response:
+        config = current_app.config
+        if (
+            not config["COMPRESS_ENABLED"]
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or request.method == "HEAD"
+            or "Content-Encoding" in response.headers
+            or response.direct_passthrough
+            or response.mimetype not in config["COMPRESS_MIMETYPES"]
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = self._choose(config)
+        if encoding is None:
+            return response
+        if not response.is_streamed and response.content_length is not None and response.content_length < config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        compressor = available_encoders()[encoding](config["COMPRESS_LEVEL"])
+        if response.is_streamed:
+            response.response = _CompressedStream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+        response.headers["Content-Encoding"] = encoding
+        if response.headers.get("ETag"):
+            # The representation changed; a strong validator would no longer match the bytes.
+            response.headers["ETag"] = "W/" + response.headers["ETag"].removeprefix("W/")
+        return response
@@ -1,20 +1,24 @@
 from functools import wraps
-from flask import jsonify
+from flask import g, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from ..models.user import User
-from ..extensions import db
+from ..extensions import permissions
+from .permissions import permission_mask
 
 
-def role_required(role: str):
+def permission_required(*names: str):
+    # Compiled once at import; a misspelt permission fails at startup, not on the first request.
+    required = permission_mask(names)
+
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
-            if not user:
+            # Routes stack this under @jwt_required(); reuse its verification instead of decoding again.
+            if not getattr(g, "_jwt_extended_jwt", None):
+                verify_jwt_in_request()
+            mask = permissions.mask_for(get_jwt_identity())
+            if mask is None:
                 return jsonify({"error": {"code": "unauthorized", "message": "User not found"}}), 401
-            if user.role != role:
+            if mask & required != required:
                 return jsonify({"error": {"code": "forbidden", "message": "Not allowed"}}), 403
             return fn(*args, **kwargs)
 
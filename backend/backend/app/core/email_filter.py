@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from . import typing as t
+from .bloom import BloomFilter
+
+
+class EmailFilter:
+    """Per-worker Bloom filter of every email in ``users``.
+
+    A miss means the email is certainly not registered as of the last sync, so
+    callers can skip the database. A hit only means "maybe" and must be
+    confirmed with a query. A background thread, started with the worker's
+    first check (after gunicorn forks), builds the filter; until it is ready
+    every email is a "maybe". Every ``EMAIL_FILTER_REFRESH_SECONDS`` the thread
+    tops it up with rows whose ``updated_at`` moved since the last sync, which
+    picks up signups and email changes made by other workers. A row committed
+    long after its ``updated_at`` can slip past that window, so the filter is
+    also rebuilt from scratch every ``EMAIL_FILTER_REBUILD_SECONDS``. Scans run
+    without the lock and requests keep reading the old filter until the new
+    one is swapped in. The unique index on ``users.email`` stays the final
+    authority.
+    """
+
+    def __init__(self):
+        self.app: t.Optional[Flask] = None
+        self._bloom: t.Optional[BloomFilter] = None
+        self._synced_at: t.Optional[datetime] = None
+        self._next_refresh = 0.0
+        self._next_rebuild = 0.0
+        # Emails added while a rebuild scans, folded into the new filter before the swap.
+        self._added_during_rebuild: t.Optional[list] = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread: t.Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def init_app(self, app: Flask) -> None:
+        # Tests build several apps in one process; stop the thread bound to the previous one.
+        self.shutdown()
+        self.app = app
+        self.capacity = app.config.get("EMAIL_FILTER_CAPACITY", 1_000_000)
+        self.error_rate = app.config.get("EMAIL_FILTER_ERROR_RATE", 0.01)
+        self.refresh_seconds = app.config.get("EMAIL_FILTER_REFRESH_SECONDS", 60)
+        self.rebuild_seconds = app.config.get("EMAIL_FILTER_REBUILD_SECONDS", 3600)
+        self.background = app.config.get("EMAIL_FILTER_BACKGROUND", True)
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._bloom = None
+            self._synced_at = None
+            self._next_refresh = 0.0
+            self._next_rebuild = 0.0
+            self._added_during_rebuild = None
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join(timeout)
+
+    def add(self, email: str) -> None:
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(email)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(email)
+
+    def might_contain(self, email: str) -> bool:
+        if self.background:
+            self._ensure_started()
+        else:
+            self.sync()
+        bloom = self._bloom
+        return bloom is None or email in bloom
+
+    def sync(self) -> None:
+        """Top up or rebuild the filter if either is due; a sync already running is not waited for."""
+        if self._bloom is not None and time.monotonic() < self._next_refresh:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._sync()
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self) -> None:
+        from ..extensions import db
+        from ..models.user import User
+
+        bloom = self._bloom
+        if bloom is not None and time.monotonic() < self._next_refresh:
+            return
+        started = datetime.utcnow()
+        query = db.session.query(User.email)
+        rebuild = bloom is None or bloom.count > bloom.capacity or time.monotonic() >= self._next_rebuild
+        if rebuild:
+            with self._lock:
+                self._added_during_rebuild = []
+            try:
+                # Sized so the filter stays at or under capacity for a while.
+                total = db.session.query(User.id).count()
+                fresh = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+                # Nobody else can see the new filter yet, so it is filled without the lock.
+                for (email,) in query.yield_per(10_000):
+                    fresh.add(email)
+            except BaseException:
+                with self._lock:
+                    self._added_during_rebuild = None
+                raise
+            with self._lock:
+                for email in self._added_during_rebuild:
+                    fresh.add(email)
+                self._added_during_rebuild = None
+                self._bloom = fresh
+        else:
+            # Overlap the window a little for transactions that commit just after their updated_at;
+            # anything later waits for the next rebuild. Re-adding known emails leaves count alone.
+            query = query.filter(User.updated_at >= self._synced_at - timedelta(seconds=5))
+            emails = [email for (email,) in query.yield_per(10_000)]
+            with self._lock:
+                for email in emails:
+                    bloom.add(email)
+        self._synced_at = started
+        self._next_refresh = time.monotonic() + self.refresh_seconds
+        if rebuild:
+            self._next_rebuild = time.monotonic() + self.rebuild_seconds
+
+    def _ensure_started(self) -> None:
+        # Started lazily, after gunicorn has forked, so each worker builds its own filter.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-filter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.sync()
+            except Exception:
+                self.app.logger.exception("Email filter sync failed")
+            # After a failed sync the schedule has not moved, so wait a full interval before retrying.
+            wait = self._next_refresh - time.monotonic()
+            self._stop.wait(wait if wait > 0 else self.refresh_seconds)
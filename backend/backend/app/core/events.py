@@ -0,0 +1,146 @@
+import json
+import queue
+import threading
+import time
+
+from flask import Flask, current_app
+from sqlalchemy import text
+
+from . import typing as t
+
+PG_CHANNEL = "user_events"
+
+
+class Subscription:
+    """One listener's bounded inbox. If it overflows, the listener is told to resync instead of blocking publishers."""
+
+    def __init__(self, broker: "EventBroker", maxsize: int):
+        self._broker = broker
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> t.Optional[dict]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class LocalBackend:
+    """Single-process stand-in: events only reach subscribers in this worker."""
+
+    def __init__(self, broker: "EventBroker", app: Flask):
+        self.broker = broker
+
+    def publish(self, event: dict) -> None:
+        self.broker.dispatch(event)
+
+    def start(self) -> None:
+        pass
+
+
+class PostgresNotifyBackend:
+    """Cross-worker fan-out over PostgreSQL LISTEN/NOTIFY.
+
+    Publishing is a ``pg_notify``; each worker runs one listener thread on a
+    dedicated connection and dispatches what arrives to its local subscribers,
+    including events this worker published itself.
+    """
+
+    def __init__(self, broker: "EventBroker", app: Flask):
+        self.broker = broker
+        self.app = app
+        self._thread: t.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, event: dict) -> None:
+        from ..extensions import db
+
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": PG_CHANNEL, "payload": json.dumps(event)})
+            conn.commit()
+
+    def start(self) -> None:
+        # Started with the first subscriber, after gunicorn has forked the worker.
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            with self.app.app_context():
+                from ..extensions import db
+
+                dsn = db.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self._thread = threading.Thread(target=self._listen, args=(dsn,), name="user-events-listener", daemon=True)
+            self._thread.start()
+
+    def _listen(self, dsn: str) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while True:
+            try:
+                with psycopg.connect(dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {PG_CHANNEL}")
+                    backoff = 1.0
+                    for notify in conn.notifies():
+                        self.broker.dispatch(json.loads(notify.payload))
+            except Exception:
+                self.app.logger.exception("User event listener lost its connection; retrying in %.0fs", backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+BACKENDS = {"local": LocalBackend, "postgres": PostgresNotifyBackend}
+
+
+class EventBroker:
+    """In-process pub/sub for user change events, with a pluggable cross-worker backend."""
+
+    def __init__(self):
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        self.backend: t.Any = None
+
+    def init_app(self, app: Flask) -> None:
+        self.queue_size = app.config.get("EVENTS_QUEUE_SIZE", 100)
+        self.max_streams = app.config.get("EVENTS_MAX_STREAMS", 4)
+        self.backend = BACKENDS[app.config.get("EVENTS_BACKEND", "local")](self, app)
+        app.extensions["user_events"] = self
+
+    def publish(self, event_type: str, data: dict) -> None:
+        # Called after the change is committed; a broken event pipe must not fail the request.
+        try:
+            self.backend.publish({"type": event_type, "data": data})
+        except Exception:
+            current_app.logger.exception("Failed to publish %s event", event_type)
+
+    def dispatch(self, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def subscribe(self) -> t.Optional[Subscription]:
+        """Register a listener, or return None if this worker already holds ``EVENTS_MAX_STREAMS``.
+
+        Every open stream pins a worker thread, so the cap keeps threads free for other endpoints.
+        """
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            if self.max_streams and len(self._subscribers) >= self.max_streams:
+                return None
+            self._subscribers.add(subscription)
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
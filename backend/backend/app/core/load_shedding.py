@@ -0,0 +1,125 @@
+import math
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+from . import typing as t
+
+LIMIT_ENVIRON_KEY = "userdashboard.concurrency"
+# Liveness probes must answer even when every class is saturated.
+NEVER_SHED = frozenset({"health", "static"})
+
+
+class AdaptiveLimit:
+    """Gradient concurrency limit for one endpoint class, in the style of Netflix's Gradient2.
+
+    A slow moving average of latency is the baseline. While recent requests
+    finish within ``tolerance`` times that baseline, the limit grows by about
+    ``sqrt(limit)`` per sample. When latency climbs past it, the limit shrinks
+    in proportion (at most by half per sample), before queueing turns into
+    timeouts. The limit only grows while it is actually being used.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, tolerance: float = 2.0, smoothing: float = 0.2):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.baseline: t.Optional[float] = None
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> t.Optional[int]:
+        """Take a slot; returns the in-flight count before this request, or None to shed."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.shed += 1
+                return None
+            self.in_flight += 1
+            return self.in_flight - 1
+
+    def release(self, latency: t.Optional[float], in_flight_before: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if latency is None:
+                return
+            if self.baseline is None:
+                self.baseline = latency
+            else:
+                # ~100-sample window; recovers slowly so a burst of slow requests cannot reset it.
+                self.baseline += (latency - self.baseline) / 100
+            gradient = max(0.5, min(1.0, self.tolerance * self.baseline / max(latency, 1e-6)))
+            target = self.limit * gradient + math.sqrt(self.limit)
+            if in_flight_before + 1 < self.limit / 2:
+                # App-limited: low traffic says nothing about how much more we could take.
+                target = min(target, self.limit)
+            limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+            self.limit = min(max(limit, self.minimum), self.maximum)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "inFlight": self.in_flight,
+                "baselineMs": None if self.baseline is None else round(self.baseline * 1000, 2),
+                "shed": self.shed,
+            }
+
+
+class LoadShedder:
+    """Per-worker adaptive concurrency limits per endpoint class.
+
+    Each endpoint listed in ``LOAD_SHED_CLASSES`` belongs to a class with its
+    own ``AdaptiveLimit``, so slow bcrypt logins cannot use up the slots meant for
+    cheap profile reads. Requests over the limit get an immediate 503 with
+    ``Retry-After`` instead of queueing behind work the worker cannot finish
+    in time. Unlisted endpoints, and ``/health`` always, are never limited.
+    """
+
+    def __init__(self):
+        self.limits: dict = {}
+        self._classes: dict = {}
+
+    def init_app(self, app: Flask) -> None:
+        self.enabled = app.config.get("LOAD_SHED_ENABLED", True)
+        self.retry_after = app.config.get("LOAD_SHED_RETRY_AFTER", 1)
+        self._classes = {
+            endpoint: name for name, endpoints in app.config.get("LOAD_SHED_CLASSES", {}).items() for endpoint in endpoints
+        }
+        self.limits = {
+            name: AdaptiveLimit(*bounds, tolerance=app.config.get("LOAD_SHED_TOLERANCE", 2.0))
+            for name, bounds in app.config.get("LOAD_SHED_LIMITS", {}).items()
+        }
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+        app.extensions["load_shedder"] = self
+
+    def status(self) -> dict:
+        return {name: limit.status() for name, limit in self.limits.items()}
+
+    def before_request(self) -> t.Optional[Response]:
+        if not self.enabled or request.endpoint in NEVER_SHED:
+            return None
+        name = self._classes.get(request.endpoint)
+        limit = self.limits.get(name)
+        if limit is None:
+            return None
+        in_flight = limit.try_acquire()
+        if in_flight is None:
+            response = jsonify({"error": {"code": "overloaded", "message": "Server is busy, retry shortly"}})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(self.retry_after)
+            return response
+        request.environ[LIMIT_ENVIRON_KEY] = (limit, in_flight, time.perf_counter())
+        return None
+
+    def teardown_request(self, exc: t.Optional[BaseException]) -> None:
+        slot = request.environ.pop(LIMIT_ENVIRON_KEY, None)
+        if slot is None:
+            return
+        limit, in_flight, started = slot
+        # Failed requests free their slot but are not latency samples.
+        limit.release(None if exc is not None else time.perf_counter() - started, in_flight)
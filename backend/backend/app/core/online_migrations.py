@@ -0,0 +1,132 @@
+import logging
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import op
+
+from . import typing as t
+
+log = logging.getLogger("alembic.runtime.migration")
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+@contextmanager
+def _autocommit(lock_timeout: t.Optional[str] = None):
+    # Commits what the migration has done so far; every statement inside runs in its own transaction.
+    with op.get_context().autocommit_block():
+        if lock_timeout and _is_postgresql():
+            op.execute(sa.text(f"SET lock_timeout = '{lock_timeout}'"))
+        try:
+            yield
+        finally:
+            if lock_timeout and _is_postgresql():
+                op.execute(sa.text("RESET lock_timeout"))
+
+
+def _drop_if_invalid(name: str) -> None:
+    # A failed or cancelled CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would keep.
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        log.info("Dropping invalid index %s left by an earlier attempt", name)
+        op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: list,
+    unique: bool = False,
+    where: t.Optional[str] = None,
+    lock_timeout: t.Optional[str] = None,
+) -> None:
+    """Build an index without blocking writes; safe to rerun after a failure.
+
+    ``where`` makes it a partial index on both dialects. ``lock_timeout``
+    (e.g. ``"5s"``) gives up instead of queueing behind long transactions.
+    """
+    condition = sa.text(where) if where else None
+    if not _is_postgresql():
+        op.create_index(name, table, columns, unique=unique, sqlite_where=condition, if_not_exists=True)
+        return
+    with _autocommit(lock_timeout):
+        _drop_if_invalid(name)
+        op.create_index(
+            name, table, columns, unique=unique, postgresql_where=condition, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def drop_index_concurrently(name: str, table: str, lock_timeout: t.Optional[str] = None) -> None:
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    with _autocommit(lock_timeout):
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    where: t.Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 1000,
+    pause: float = 0.1,
+    params: t.Optional[dict] = None,
+) -> int:
+    """``UPDATE table SET assignments [WHERE where]`` in short, separately committed batches.
+
+    Batches walk ``key`` in order, so each UPDATE touches at most
+    ``batch_size`` rows and holds their locks only briefly. ``pause`` seconds
+    between batches leaves room for replication and for the app's own
+    writes. Progress is logged after every batch. Batches are idempotent only
+    if the assignments are; guard with ``where`` (e.g. ``new_col IS NULL``) so
+    an interrupted run can be resumed. Returns the number of rows updated.
+    """
+    conn = op.get_bind()
+    params = dict(params or {})
+    condition = f" AND ({where})" if where else ""
+    total = conn.execute(sa.text(f"SELECT count(*) FROM {table} WHERE 1 = 1{condition}"), params).scalar()
+    log.info("Backfilling %s: %d rows to update in batches of %d", table, total, batch_size)
+
+    updated = 0
+    last = None
+    started = time.monotonic()
+    while True:
+        # One block per batch: its commit releases the batch's row locks on PostgreSQL and
+        # SQLite's single write lock (taken by BEGIN IMMEDIATE in SQLite mode) before the pause.
+        with _autocommit():
+            after = "" if last is None else f"WHERE {key} > :_after "
+            keys = conn.execute(
+                sa.text(f"SELECT {key} FROM {table} {after}ORDER BY {key} LIMIT :_limit"),
+                {"_after": last, "_limit": batch_size},
+            ).scalars().all()
+            if not keys:
+                break
+            lower = "" if last is None else f"{key} > :_after AND "
+            result = conn.execute(
+                sa.text(f"UPDATE {table} SET {assignments} WHERE {lower}{key} <= :_upto{condition}"),
+                {**params, "_after": last, "_upto": keys[-1]},
+            )
+        updated += max(result.rowcount, 0)
+        last = keys[-1]
+        elapsed = time.monotonic() - started
+        log.info(
+            "Backfilling %s: %d/%d rows (%.0f%%), %.0f rows/s",
+            table,
+            updated,
+            total,
+            100.0 * updated / total if total else 100.0,
+            updated / elapsed if elapsed else 0.0,
+        )
+        if pause:
+            time.sleep(pause)
+    return updated
@@ -0,0 +1,204 @@
+import hashlib
+import heapq
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from threading import Lock
+
+from flask import Flask
+
+from . import typing as t
+
+MAGIC = b"PWDENY1\n"
+RECORD_SIZE = 8
+# Runs merged at once; keeps open files well under the usual 1024 limit at any input size.
+MERGE_FAN_IN = 128
+
+
+def password_key(password: t.Union[str, bytes]) -> bytes:
+    """Fixed-width key for a password: the first 8 bytes of its SHA-1.
+
+    SHA-1 matches the Have I Been Pwned dumps, so those can be compiled without
+    the plaintext. 64 bits keeps accidental collisions negligible at a few
+    hundred million entries.
+    """
+    if isinstance(password, str):
+        password = password.encode("utf-8")
+    return hashlib.sha1(password).digest()[:RECORD_SIZE]
+
+
+def _parse_key(line: bytes, sha1: bool) -> int:
+    key = bytes.fromhex(line.split(b":", 1)[0].decode("ascii"))[:RECORD_SIZE] if sha1 else password_key(line)
+    # Big-endian, so integer order is the byte order the lookup binary-searches.
+    return int.from_bytes(key, "big")
+
+
+def _new_run(directory: str, write: t.Any) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".denylist-run-")
+    try:
+        with os.fdopen(fd, "wb", buffering=1 << 20) as out:
+            write(out)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _write_run(keys: array, directory: str) -> str:
+    run = array("Q", sorted(keys))
+    if sys.byteorder == "little":
+        run.byteswap()
+    return _new_run(directory, run.tofile)
+
+
+def _read_run(path: str) -> t.Iterable[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(RECORD_SIZE * 65536)
+            if not block:
+                return
+            for offset in range(0, len(block), RECORD_SIZE):
+                yield block[offset:offset + RECORD_SIZE]
+
+
+def _merge_runs(runs: list, directory: str) -> str:
+    def write(out):
+        for key in heapq.merge(*(_read_run(run) for run in runs)):
+            out.write(key)
+
+    return _new_run(directory, write)
+
+
+def build_denylist(lines: t.Iterable[bytes], output_path: str, sha1: bool = False, chunk_records: int = 1_000_000) -> int:
+    """Compile passwords (or ``SHA1[:count]`` lines when ``sha1``) into a sorted key file.
+
+    Memory stays bounded whatever the input size. Keys are packed 8 bytes
+    apiece into chunks of ``chunk_records``, and each chunk is sorted into a
+    temporary run file. The runs are then merged, ``MERGE_FAN_IN`` at a time,
+    and deduplicated into the output. The file is written next to
+    ``output_path`` and renamed into place, so running workers keep reading
+    the old file until they reopen it.
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    runs = []
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".denylist-")
+    try:
+        chunk = array("Q")
+        for line in lines:
+            line = line.rstrip(b"\r\n")
+            if not line:
+                continue
+            chunk.append(_parse_key(line, sha1))
+            if len(chunk) >= chunk_records:
+                runs.append(_write_run(chunk, directory))
+                chunk = array("Q")
+        if chunk:
+            runs.append(_write_run(chunk, directory))
+        del chunk
+        while len(runs) > MERGE_FAN_IN:
+            group, runs = runs[:MERGE_FAN_IN], runs[MERGE_FAN_IN:]
+            try:
+                runs.append(_merge_runs(group, directory))
+            finally:
+                for path in group:
+                    os.unlink(path)
+
+        count = 0
+        previous = None
+        with os.fdopen(fd, "wb", buffering=1 << 20) as out:
+            out.write(MAGIC)
+            for key in heapq.merge(*(_read_run(path) for path in runs)):
+                if key != previous:
+                    out.write(key)
+                    previous = key
+                    count += 1
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    finally:
+        for path in runs:
+            os.unlink(path)
+    return count
+
+
+class PasswordDenylist:
+    """Breached-password lookups against a memory-mapped sorted key file.
+
+    The file is mapped read-only, so every worker on the host shares one copy
+    in the page cache and nothing is loaded onto the heap. A lookup is a
+    binary search over fixed-width records: about 25 probes for tens of
+    millions of entries. With no file configured every password passes; an
+    unreadable or foreign file is logged once and the check is disabled.
+    """
+
+    def __init__(self):
+        self.app: t.Optional[Flask] = None
+        self.path: t.Optional[str] = None
+        self._mmap: t.Optional[mmap.mmap] = None
+        self._count = 0
+        self._broken = False
+        self._lock = Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.close()
+        self.app = app
+        self.path = app.config.get("PASSWORD_DENYLIST_PATH") or os.path.join(app.instance_path, "breached_passwords.bin")
+        app.extensions["password_denylist"] = self
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = None
+            self._count = 0
+            self._broken = False
+
+    def __len__(self) -> int:
+        self._open()
+        return self._count
+
+    def contains(self, password: str) -> bool:
+        mm = self._open()
+        if mm is None:
+            return False
+        key = password_key(password)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = len(MAGIC) + mid * RECORD_SIZE
+            probe = mm[offset:offset + RECORD_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def _open(self) -> t.Optional[mmap.mmap]:
+        if self._mmap is not None or self.path is None or self._broken:
+            return self._mmap
+        with self._lock:
+            if self._mmap is None and not self._broken and os.path.exists(self.path):
+                try:
+                    with open(self.path, "rb") as f:
+                        if f.read(len(MAGIC)) != MAGIC:
+                            raise ValueError("not a password denylist")
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError) as err:
+                    # A bad file must not turn every signup into a 500.
+                    self._broken = True
+                    self.app.logger.error(
+                        "Breached-password check disabled: cannot read %s (%s); rebuild it with `flask passwords build`",
+                        self.path,
+                        err,
+                    )
+                    return None
+                self._count = (len(mm) - len(MAGIC)) // RECORD_SIZE
+                self._mmap = mm
+            return self._mmap
@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Flask
+
+from . import typing as t
+
+# Bit positions follow this order; append new permissions, never reorder.
+PERMISSIONS = (
+    "users:list",
+    "users:stats",
+    "users:events",
+    "users:manage",
+    "users:delete",
+    "users:restore",
+    "audit:read",
+)
+_BITS = {name: 1 << index for index, name in enumerate(PERMISSIONS)}
+_MISSING = object()
+
+
+def permission_mask(names: t.Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        try:
+            mask |= _BITS[name]
+        except KeyError:
+            raise ValueError(f"Unknown permission: {name}") from None
+    return mask
+
+
+def permission_names(mask: int) -> list:
+    return [name for name in PERMISSIONS if mask & _BITS[name]]
+
+
+class PermissionCache:
+    """Per-worker LRU of user id -> permission bitmask.
+
+    ``ROLE_PERMISSIONS`` is compiled to one integer per role at startup, so a
+    check is a dict hit and a bitwise AND. A miss loads the user's role and
+    status once; inactive users get no permissions and deleted ones are
+    cached as missing. Entries live ``PERMISSION_CACHE_SECONDS``. Status
+    changes made in this worker apply at once through ``invalidate``, others
+    once their copy expires.
+    """
+
+    def __init__(self):
+        self.role_masks: dict = {}
+        self.ttl = 30
+        self.maxsize = 4096
+        self._entries: "OrderedDict[str, tuple[t.Optional[int], float]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app: Flask) -> None:
+        self.role_masks = {role: permission_mask(names) for role, names in app.config.get("ROLE_PERMISSIONS", {}).items()}
+        self.ttl = app.config.get("PERMISSION_CACHE_SECONDS", 30)
+        self.maxsize = app.config.get("PERMISSION_CACHE_SIZE", 4096)
+        self.clear()
+        app.extensions["permissions"] = self
+
+    def mask_for(self, identity: t.Any) -> t.Optional[int]:
+        """Permission bitmask of a live user, or None if the user does not exist."""
+        key = str(identity)
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        mask = self._load(key)
+        if self.ttl > 0 and self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = (mask, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return mask
+
+    def _load(self, identity: str) -> t.Optional[int]:
+        from ..models.user import User
+
+        user = User.get_live(identity)
+        if user is None:
+            return None
+        if user.status != "active":
+            return 0
+        return self.role_masks.get(user.role, 0)
+
+    def invalidate(self, identity: t.Any) -> None:
+        with self._lock:
+            self._entries.pop(str(identity), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
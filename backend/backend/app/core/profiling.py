@@ -0,0 +1,247 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import Flask, Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+from itsdangerous import BadSignature, TimestampSigner
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import typing as t
+
+PHASES = ("sql", "bcrypt", "jwt", "serialize")
+# Kept in the WSGI environ rather than on g: batched sub-requests share the outer request's g.
+PROFILE_ENVIRON_KEY = "userdashboard.profile"
+
+_current: "ContextVar[t.Optional[PhaseTimer]]" = ContextVar("request_profile", default=None)
+
+
+class PhaseTimer:
+    """Splits a request's wall time into named phases.
+
+    Phases nest exclusively: SQL issued while serializing is charged to
+    ``sql`` only, so the phases plus ``app`` add up to the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals: dict = defaultdict(float)
+        self._stack: list = []
+        self._mark = self.started
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self.totals[self._stack[-1]] += now - self._mark
+        self._stack.append(name)
+        self._mark = now
+
+    def exit(self, name: str) -> None:
+        if not self._stack or self._stack[-1] != name:
+            return
+        now = time.perf_counter()
+        self.totals[self._stack.pop()] += now - self._mark
+        self._mark = now
+
+    def split(self) -> dict:
+        total = time.perf_counter() - self.started
+        split = {name: self.totals.get(name, 0.0) for name in PHASES}
+        split["app"] = max(total - sum(split.values()), 0.0)
+        split["total"] = total
+        return split
+
+
+class phase:
+    """Charge the enclosed block to ``name`` when the current request is being profiled; free otherwise."""
+
+    __slots__ = ("name", "timer")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.timer = _current.get()
+        if self.timer is not None:
+            self.timer.enter(self.name)
+
+    def __exit__(self, *exc) -> None:
+        if self.timer is not None:
+            self.timer.exit(self.name)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    timer = _current.get()
+    if timer is not None:
+        timer.enter("sql")
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    timer = _current.get()
+    if timer is not None:
+        timer.exit("sql")
+
+
+@event.listens_for(Engine, "handle_error")
+def _sql_failed(exception_context):
+    timer = _current.get()
+    if timer is not None:
+        timer.exit("sql")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}"
+
+
+class _ProfiledJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        with phase("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts folded stacks.
+
+    Output is the ``frame;frame;frame count`` format read by flamegraph.pl,
+    speedscope and inferno. Sampling costs one ``sys._current_frames()`` per
+    tick on a side thread; the profiled code itself is not instrumented.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self, root: str) -> str:
+        return "".join(f"{root};{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RequestProfiler:
+    """On-demand sampling profiler for individual requests.
+
+    A request is profiled when it carries a valid ``PROFILE_HEADER`` token
+    (minted with ``flask profile token``) or is picked by
+    ``PROFILE_SAMPLE_RATE``. Each profile writes a folded-stack file and a JSON
+    summary to ``PROFILE_DIR`` and logs the SQL/bcrypt/JWT/serialization split.
+    Token-triggered requests also get the split back as a ``Server-Timing``
+    header. Everything else pays one config lookup per request.
+    """
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.json = _ProfiledJSONProvider(app)
+        app.extensions["request_profiler"] = self
+
+    @staticmethod
+    def _signer(app: Flask) -> TimestampSigner:
+        return TimestampSigner(app.config["SECRET_KEY"], salt="request-profile")
+
+    def make_token(self, app: Flask, ttl: int) -> str:
+        return self._signer(app).sign(str(ttl)).decode("ascii")
+
+    def _token_valid(self, token: str) -> bool:
+        try:
+            value, signed_at = self._signer(current_app).unsign(token, return_timestamp=True)
+            return time.time() - signed_at.timestamp() <= int(value)
+        except (BadSignature, ValueError):
+            return False
+
+    def before_request(self) -> None:
+        # Batched sub-requests run inside the outer request and are charged to its profile.
+        if _current.get() is not None:
+            return
+        config = current_app.config
+        token = request.headers.get(config["PROFILE_HEADER"])
+        if token:
+            triggered = self._token_valid(token)
+        else:
+            rate = config["PROFILE_SAMPLE_RATE"]
+            triggered = rate > 0 and random.random() < rate
+        if not triggered:
+            return
+
+        sampler = StackSampler(threading.get_ident(), config["PROFILE_SAMPLE_INTERVAL"])
+        request.environ[PROFILE_ENVIRON_KEY] = (_current.set(PhaseTimer()), sampler, bool(token))
+        sampler.start()
+
+    def after_request(self, response: Response) -> Response:
+        profile = request.environ.pop(PROFILE_ENVIRON_KEY, None)
+        if profile is None:
+            return response
+        context_token, sampler, report = profile
+        timer = _current.get()
+        sampler.stop()
+        _current.reset(context_token)
+
+        split = timer.split()
+        if report:
+            response.headers["Server-Timing"] = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in split.items())
+        try:
+            self._write(response, split, sampler)
+        except OSError:
+            current_app.logger.exception("Failed to write request profile")
+        return response
+
+    def teardown_request(self, exc: t.Optional[BaseException]) -> None:
+        # after_request is skipped when the view raised; don't leave the sampler running.
+        profile = request.environ.pop(PROFILE_ENVIRON_KEY, None)
+        if profile is not None:
+            context_token, sampler, _ = profile
+            sampler.stop()
+            _current.reset(context_token)
+
+    def _write(self, response: Response, split: dict, sampler: StackSampler) -> None:
+        directory = current_app.config["PROFILE_DIR"] or os.path.join(current_app.instance_path, "profiles")
+        os.makedirs(directory, exist_ok=True)
+        endpoint = request.endpoint or "unmatched"
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        with open(os.path.join(directory, name + ".folded"), "w") as f:
+            f.write(sampler.folded(f"{request.method} {request.path}"))
+        summary = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "samples": sum(sampler.samples.values()),
+            "split_ms": {name: round(seconds * 1000, 3) for name, seconds in split.items()},
+        }
+        with open(os.path.join(directory, name + ".json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        current_app.logger.info(
+            "Profiled %s %s -> %s: %s",
+            request.method,
+            request.path,
+            name,
+            " ".join(f"{key}={ms}ms" for key, ms in summary["split_ms"].items()),
+        )
@@ -1,13 +1,16 @@
 from . import typing as t
-from ..extensions import bcrypt
+from .profiling import phase
+from ..extensions import bcrypt, password_denylist
 
 
 def hash_password(password: str) -> str:
-    return bcrypt.generate_password_hash(password).decode("utf-8")
+    with phase("bcrypt"):
+        return bcrypt.generate_password_hash(password).decode("utf-8")
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.check_password_hash(hashed, password)
+    with phase("bcrypt"):
+        return bcrypt.check_password_hash(hashed, password)
 
 
 def validate_password_strength(password: str) -> t.Optional[str]:
@@ -15,4 +18,6 @@ def validate_password_strength(password: str) -> t.Optional[str]:
         return "Password must be at least 8 characters"
     if password.isalpha() or password.isnumeric():
         return "Password must include letters and numbers"
+    if password_denylist.contains(password):
+        return "This password has appeared in a data breach; choose a different one"
     return None
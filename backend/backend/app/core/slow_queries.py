@@ -0,0 +1,320 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import typing as t
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_BINDS = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")
+_NUMBERS = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\(\?\+\)|\(\?\))(?:\s*,\s*(?:\(\?\+\)|\(\?\)))+")
+_SPACE = re.compile(r"\s+")
+# SELECTs that ANALYZE must not run twice: a rollback does not undo sequence advances, notifications,
+# advisory locks or SELECT INTO tables, and row locks would be held again for the whole EXPLAIN.
+_SIDE_EFFECTS = re.compile(
+    r"\b(?:nextval|setval|pg_notify|pg_advisory_\w*|pg_try_advisory_\w*|lo_\w+)\s*\("
+    r"|\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b"
+    r"|\bINTO\b",
+    re.I,
+)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so executions that differ only in values share one entry.
+
+    Literals and bind markers become ``?``, ``IN (?, ?, ?)`` lists collapse to
+    ``(?+)`` and multi-row ``VALUES`` lists to a single row.
+    """
+    text = _COMMENTS.sub(" ", statement)
+    text = _STRINGS.sub("?", text)
+    text = _BINDS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _LISTS.sub("(?+)", text)
+    text = _ROWS.sub(r"\1", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def safe_to_explain(statement: str) -> bool:
+    """Whether re-running ``statement`` under ``EXPLAIN ANALYZE`` has no effect beyond its cost."""
+    return statement.lstrip()[:6].lower() == "select" and not _SIDE_EFFECTS.search(statement)
+
+
+def fingerprint_id(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def weighted_percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile over ``(value, weight)`` pairs."""
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    target = q * sum(weight for _, weight in samples)
+    seen = 0.0
+    for value, weight in samples:
+        seen += weight
+        if seen >= target:
+            return value
+    return samples[-1][0]
+
+
+class QueryStat:
+    """Timings for one fingerprint; durations are kept as a fixed-size uniform reservoir."""
+
+    __slots__ = ("fingerprint", "count", "total", "max", "slow", "samples", "plan")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.samples: list = []
+        self.plan: t.Optional[str] = None
+
+    def record(self, elapsed: float, slow: bool, sample_size: int) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.slow += slow
+        if len(self.samples) < sample_size:
+            self.samples.append(elapsed)
+        else:
+            slot = random.randrange(self.count)
+            if slot < sample_size:
+                self.samples[slot] = elapsed
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "slow": self.slow,
+            "samples": list(self.samples),
+            "plan": self.plan,
+        }
+
+
+def summarize(snapshots: t.Iterable[dict]) -> list:
+    """Merge per-worker snapshots into one row per fingerprint, with percentiles in milliseconds.
+
+    Each worker's reservoir stands for all of that worker's executions, so its
+    samples are weighted by ``count / len(samples)`` when merged.
+    """
+    merged: dict = {}
+    for snapshot in snapshots:
+        for entry in snapshot.values():
+            row = merged.setdefault(
+                entry["fingerprint"],
+                {"fingerprint": entry["fingerprint"], "count": 0, "total": 0.0, "max": 0.0, "slow": 0, "weighted": [], "plan": None},
+            )
+            row["count"] += entry["count"]
+            row["total"] += entry["total"]
+            row["max"] = max(row["max"], entry["max"])
+            row["slow"] += entry["slow"]
+            row["plan"] = row["plan"] or entry["plan"]
+            if entry["samples"]:
+                weight = entry["count"] / len(entry["samples"])
+                row["weighted"].extend((value, weight) for value in entry["samples"])
+
+    rows = []
+    for row in merged.values():
+        weighted = row.pop("weighted")
+        row["id"] = fingerprint_id(row["fingerprint"])
+        row["mean_ms"] = row["total"] / row["count"] * 1000 if row["count"] else 0.0
+        for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            row[name] = weighted_percentile(weighted, q) * 1000
+        row["total_ms"] = row.pop("total") * 1000
+        row["max_ms"] = row.pop("max") * 1000
+        rows.append(row)
+    return rows
+
+
+class SlowQueryLog:
+    """Times every statement through engine events and keeps per-fingerprint aggregates.
+
+    Statements at or over ``SLOW_QUERY_THRESHOLD_MS`` are logged. At most
+    ``SLOW_QUERY_MAX_FINGERPRINTS`` entries are kept; when full, the entry with
+    the least total time is evicted. On PostgreSQL with ``SLOW_QUERY_EXPLAIN``,
+    the first slow execution of a SELECT fingerprint is re-run once as
+    ``EXPLAIN (ANALYZE, BUFFERS)`` on a side connection and the plan is kept
+    with the entry. SELECTs with side effects (``nextval()``, ``FOR UPDATE``
+    and the like) are never re-run. Each worker writes its aggregates to ``SLOW_QUERY_DIR``
+    every ``SLOW_QUERY_SNAPSHOT_SECONDS`` and at exit, which is what
+    ``flask queries top`` reads.
+    """
+
+    def __init__(self):
+        self.app: t.Optional[Flask] = None
+        self.enabled = False
+        self._stats: dict = {}
+        self._explaining: set = set()
+        self._lock = threading.Lock()
+        self._snapshot_thread: t.Optional[threading.Thread] = None
+        self._atexit_registered = False
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.enabled = app.config.get("SLOW_QUERY_LOG_ENABLED", True)
+        self.threshold = app.config.get("SLOW_QUERY_THRESHOLD_MS", 200) / 1000
+        self.max_fingerprints = app.config.get("SLOW_QUERY_MAX_FINGERPRINTS", 500)
+        self.sample_size = app.config.get("SLOW_QUERY_SAMPLE_SIZE", 128)
+        self.explain = app.config.get("SLOW_QUERY_EXPLAIN", False)
+        self.explain_timeout_ms = app.config.get("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 5000)
+        self.snapshot_seconds = app.config.get("SLOW_QUERY_SNAPSHOT_SECONDS", 60)
+        self.directory = app.config.get("SLOW_QUERY_DIR") or os.path.join(app.instance_path, "slow_queries")
+        if not event.contains(Engine, "before_cursor_execute", self._before_execute):
+            event.listen(Engine, "before_cursor_execute", self._before_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_execute)
+            event.listen(Engine, "handle_error", self._execute_failed)
+        app.extensions["slow_query_log"] = self
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: stat.to_dict() for key, stat in self._stats.items()}
+
+    def top(self, limit: int = 10, sort: str = "total_ms", include_snapshots: bool = False) -> list:
+        """Worst fingerprints in this process, plus other workers' snapshot files when asked."""
+        snapshots = [self.snapshot()]
+        if include_snapshots:
+            snapshots.extend(self._read_snapshots())
+        return sorted(summarize(snapshots), key=lambda row: row[sort], reverse=True)[:limit]
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not self.enabled or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if conn.get_execution_options().get("slow_query_log", True) is False:
+            return
+        slow = elapsed >= self.threshold
+        key = fingerprint(statement)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k].total)]
+                stat = self._stats[key] = QueryStat(key)
+            stat.record(elapsed, slow, self.sample_size)
+            explain = (
+                slow
+                and self.explain
+                and stat.plan is None
+                and key not in self._explaining
+                and not executemany
+                and conn.dialect.name == "postgresql"
+                and safe_to_explain(statement)
+            )
+            if explain:
+                self._explaining.add(key)
+        self._ensure_snapshots()
+
+        if slow:
+            self.app.logger.warning("Slow query %s (%.1f ms): %s", fingerprint_id(key), elapsed * 1000, key)
+        if explain:
+            threading.Thread(
+                target=self._explain, args=(conn.engine, key, statement, parameters), name="slow-query-explain", daemon=True
+            ).start()
+
+    def _execute_failed(self, exception_context) -> None:
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    def _explain(self, engine: Engine, key: str, statement: str, parameters: t.Any) -> None:
+        # Off the request path and on its own connection: ANALYZE runs the query again.
+        try:
+            with engine.connect().execution_options(slow_query_log=False) as conn:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+                rows = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+                plan = "\n".join(row[0] for row in rows)
+                conn.rollback()
+        except Exception:
+            self.app.logger.exception("EXPLAIN failed for slow query %s", fingerprint_id(key))
+            return
+        finally:
+            with self._lock:
+                self._explaining.discard(key)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is not None:
+                stat.plan = plan
+        self.app.logger.warning("Plan for slow query %s:\n%s", fingerprint_id(key), plan)
+
+    # -- snapshots shared with `flask queries top` ----------------------------
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def _ensure_snapshots(self) -> None:
+        # Started lazily, after gunicorn has forked, so each worker writes its own file.
+        if not self.snapshot_seconds or (self._snapshot_thread is not None and self._snapshot_thread.is_alive()):
+            return
+        with self._lock:
+            if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+                return
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="slow-query-snapshots", daemon=True)
+            self._snapshot_thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.write_snapshot)
+                self._atexit_registered = True
+
+    def _snapshot_loop(self) -> None:
+        while True:
+            time.sleep(self.snapshot_seconds)
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._snapshot_path() + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._snapshot_path())
+        except OSError:
+            self.app.logger.exception("Failed to write slow query snapshot")
+
+    def _read_snapshots(self) -> list:
+        snapshots = []
+        own = self._snapshot_path()
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def clear_snapshots(self) -> int:
+        self.reset()
+        paths = glob.glob(os.path.join(self.directory, "*.json"))
+        for path in paths:
+            os.unlink(path)
+        return len(paths)
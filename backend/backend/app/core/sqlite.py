@@ -0,0 +1,70 @@
+import re
+
+from flask import Flask
+from sqlalchemy import event
+
+_READ_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN", "VALUES")
+# A CTE prefixes both reads and writes; erring towards "write" only costs an early lock.
+_DML = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+_STATE = "sqlite_write_txn"
+
+
+def _is_write(statement: str, context=None) -> bool:
+    if context is not None and context.compiled is not None and not context.is_text:
+        # Compiled constructs already know what they are, CTEs and all.
+        return context.isinsert or context.isupdate or context.isdelete or context.isddl
+    head = statement.lstrip()[:9].upper()
+    if head.startswith("WITH"):
+        return bool(_DML.search(statement))
+    return not head.startswith(_READ_PREFIXES)
+
+
+class SQLiteMode:
+    """Production settings for file-backed SQLite, applied to every pooled connection.
+
+    Each connection gets ``SQLITE_PRAGMAS`` (WAL, ``synchronous=NORMAL``,
+    ``busy_timeout``, ``mmap_size``...). With ``SQLITE_IMMEDIATE_WRITES``,
+    writes are also serialized the way SQLite needs. The driver's own BEGIN is
+    disabled. Reads before a transaction's first write run in autocommit,
+    each on a fresh snapshot, like PostgreSQL's READ COMMITTED. The first
+    write opens ``BEGIN IMMEDIATE``, which queues on ``busy_timeout`` for the
+    single write lock. Upgrading a read transaction would instead fail at once
+    with ``SQLITE_BUSY_SNAPSHOT`` whenever another worker had committed in
+    between. Readers never block, and the lock is held only from the first
+    write to commit, never across bcrypt.
+    """
+
+    def init_app(self, app: Flask, db) -> None:
+        self.pragmas = app.config.get("SQLITE_PRAGMAS", {})
+        self.immediate_writes = app.config.get("SQLITE_IMMEDIATE_WRITES", True)
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+                continue
+            event.listen(engine, "connect", self._on_connect)
+            if self.immediate_writes:
+                for name in ("begin", "commit", "rollback"):
+                    event.listen(engine, name, self._reset)
+                event.listen(engine, "before_cursor_execute", self._before_execute)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        if self.immediate_writes:
+            # Take BEGIN away from pysqlite; _before_execute emits the right one.
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    @staticmethod
+    def _reset(conn) -> None:
+        conn.info[_STATE] = False
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if not conn.in_transaction():
+            return
+        if not conn.info.get(_STATE) and _is_write(statement, context):
+            cursor.execute("BEGIN IMMEDIATE")
+            conn.info[_STATE] = True
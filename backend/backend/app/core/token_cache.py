@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Flask, current_app
+from flask_jwt_extended import JWTManager
+
+from . import typing as t
+from .profiling import phase
+
+
+def _split(encoded_token: str) -> tuple[str, str]:
+    signing_input, _, signature = encoded_token.rpartition(".")
+    return signature, signing_input
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT claims, keyed by the token signature.
+
+    Entries live until the token's ``exp`` claim. ``invalidate`` /
+    ``invalidate_identity`` only drop memoized decodes: a dropped token still
+    verifies, at full cost, on its next request. They are not revocation.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple[str, dict, float]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, encoded_token: str) -> t.Optional[dict]:
+        key, signing_input = _split(encoded_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            # A reused signature over a different header/payload must go through full verification.
+            if entry is None or entry[0] != signing_input:
+                self.misses += 1
+                return None
+            _, claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(claims)
+
+    def put(self, encoded_token: str, claims: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            # Never memoize tokens without an expiry; nothing would ever evict them but LRU pressure.
+            return
+        key, signing_input = _split(encoded_token)
+        with self._lock:
+            self._entries[key] = (signing_input, dict(claims), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, encoded_token: str) -> None:
+        with self._lock:
+            self._entries.pop(_split(encoded_token)[0], None)
+
+    def invalidate_identity(self, identity: t.Any) -> None:
+        identity = str(identity)
+        with self._lock:
+            stale = [key for key, (_, claims, _) in self._entries.items() if str(claims.get("sub")) == identity]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that memoizes signature verification of access tokens.
+
+    Only the HMAC decode is cached: token type, blocklist and custom
+    verification callbacks still run on every request. Each app gets its own
+    cache in ``app.extensions``, so apps with different secrets never share
+    verified claims.
+    """
+
+    def init_app(self, app: Flask, add_context_processor: bool = False) -> None:
+        super().init_app(app, add_context_processor)
+        app.extensions["jwt_token_cache"] = TokenCache(app.config.get("JWT_DECODE_CACHE_SIZE", 1024))
+
+    @property
+    def token_cache(self) -> TokenCache:
+        return current_app.extensions["jwt_token_cache"]
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        # CSRF-bound and expired-allowed decodes are rare and carry extra checks; skip the cache.
+        if csrf_value is not None or allow_expired:
+            with phase("jwt"):
+                return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        with phase("jwt"):
+            claims = self.token_cache.get(encoded_token)
+            if claims is not None:
+                return claims
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            self.token_cache.put(encoded_token, claims)
+            return claims
+
+    def _encode_jwt_from_config(self, *args, **kwargs) -> str:
+        with phase("jwt"):
+            return super()._encode_jwt_from_config(*args, **kwargs)
@@ -1,3 +1,3 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable, Union
 
-__all__ = ["Optional", "Dict", "Any", "List"]
+__all__ = ["Optional", "Dict", "Any", "List", "Iterable", "Union"]
@@ -1,10 +1,31 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 
+from .core.audit import AuditWriter
+from .core.compression import Compress
+from .core.email_filter import EmailFilter
+from .core.events import EventBroker
+from .core.load_shedding import LoadShedder
+from .core.password_denylist import PasswordDenylist
+from .core.permissions import PermissionCache
+from .core.profiling import RequestProfiler
+from .core.slow_queries import SlowQueryLog
+from .core.sqlite import SQLiteMode
+from .core.token_cache import CachingJWTManager
+
 
 db = SQLAlchemy()
 migrate = Migrate()
-jwt = JWTManager()
+sqlite_mode = SQLiteMode()
+slow_query_log = SlowQueryLog()
+jwt = CachingJWTManager()
+permissions = PermissionCache()
 bcrypt = Bcrypt()
+audit_writer = AuditWriter()
+compress = Compress()
+user_events = EventBroker()
+email_filter = EmailFilter()
+password_denylist = PasswordDenylist()
+profiler = RequestProfiler()
+load_shedder = LoadShedder()
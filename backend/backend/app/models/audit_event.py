@@ -0,0 +1,30 @@
+from datetime import datetime
+from ..extensions import db
+from .types import GUID
+
+
+class AuditEvent(db.Model):
+    __tablename__ = "audit_events"
+
+    # BIGINT on PostgreSQL; SQLite only autoincrements INTEGER primary keys.
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = db.Column(GUID(), nullable=True)
+    actor_id = db.Column(GUID(), nullable=True)
+    action = db.Column(db.String(64), nullable=False)
+    ip_address = db.Column(db.String(45))
+    details = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Serves the per-user keyset scan: WHERE user_id = ? AND id < ? ORDER BY id DESC
+    __table_args__ = (db.Index("ix_audit_events_user_id_id", "user_id", "id"),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "userId": str(self.user_id) if self.user_id else None,
+            "actorId": str(self.actor_id) if self.actor_id else None,
+            "action": self.action,
+            "ipAddress": self.ip_address,
+            "details": self.details or {},
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+        }
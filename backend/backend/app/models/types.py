@@ -0,0 +1,36 @@
+import uuid
+
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """UUID column that also accepts string ids (JWT identities, URL params).
+
+    Native ``uuid`` on PostgreSQL; elsewhere the 16 raw bytes in a BLOB, half
+    the size of the 32-character hex text SQLAlchemy would otherwise store.
+    Hex text written before the switch is still read back; migration
+    d9f4b7c2a615 converts it.
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, (bytes, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(value)
@@ -1,14 +1,63 @@
 import uuid
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import UUID
+from functools import lru_cache
+from operator import attrgetter
 from sqlalchemy import Enum
+from ..core import typing as t
+from ..core.profiling import phase
 from ..extensions import db
+from .types import GUID
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+# JSON key -> (model attribute, converter for non-null values), in output order.
+SERIALIZED_FIELDS = {
+    "id": ("id", str),
+    "email": ("email", None),
+    "fullName": ("full_name", None),
+    "role": ("role", None),
+    "status": ("status", None),
+    "createdAt": ("created_at", _isoformat),
+    "updatedAt": ("updated_at", _isoformat),
+    "lastLoginAt": ("last_login_at", _isoformat),
+}
+USER_FIELDS = tuple(SERIALIZED_FIELDS)
+
+
+class UserSerializer:
+    """Serializer for one field set; works on User instances and on projected rows alike."""
+
+    def __init__(self, fields: tuple):
+        self.fields = fields
+        self.attributes = tuple(SERIALIZED_FIELDS[f][0] for f in fields)
+        self._converters = tuple(SERIALIZED_FIELDS[f][1] for f in fields)
+        getter = attrgetter(*self.attributes)
+        # attrgetter with a single name returns a bare value rather than a tuple.
+        self._getter = getter if len(fields) > 1 else (lambda obj: (getter(obj),))
+
+    def columns(self):
+        return [getattr(User, attr) for attr in self.attributes]
+
+    def __call__(self, obj) -> dict:
+        return {
+            key: convert(value) if convert is not None and value is not None else value
+            for key, convert, value in zip(self.fields, self._converters, self._getter(obj))
+        }
+
+
+@lru_cache(maxsize=64)
+def user_serializer(fields: tuple = USER_FIELDS) -> UserSerializer:
+    """Cached per field set; callers pass fields in ``USER_FIELDS`` order so equal sets share an entry."""
+    return UserSerializer(fields)
 
 
 class User(db.Model):
     __tablename__ = "users"
 
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = db.Column(GUID(), primary_key=True, default=uuid.uuid4)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     full_name = db.Column(db.String(255), nullable=False)
@@ -17,15 +66,57 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, onupdate=datetime.utcnow)
     last_login_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime)
 
-    def to_dict(self):
-        return {
-            "id": str(self.id),
-            "email": self.email,
-            "fullName": self.full_name,
-            "role": self.role,
-            "status": self.status,
-            "createdAt": self.created_at.isoformat() if self.created_at else None,
-            "updatedAt": self.updated_at.isoformat() if self.updated_at else None,
-            "lastLoginAt": self.last_login_at.isoformat() if self.last_login_at else None,
-        }
+    # Hot-path list/count queries only ever read live rows; keep soft-deleted ones out of their index.
+    __table_args__ = (
+        db.Index(
+            "ix_users_live_created_at",
+            "created_at",
+            postgresql_where=db.text("deleted_at IS NULL"),
+            sqlite_where=db.text("deleted_at IS NULL"),
+        ),
+        # The archiver looks up soft-deleted users, then inactive users by updated_at.
+        db.Index(
+            "ix_users_deleted_at",
+            "deleted_at",
+            postgresql_where=db.text("deleted_at IS NOT NULL"),
+            sqlite_where=db.text("deleted_at IS NOT NULL"),
+        ),
+        db.Index(
+            "ix_users_inactive_updated_at",
+            "updated_at",
+            postgresql_where=db.text("status = 'inactive'"),
+            sqlite_where=db.text("status = 'inactive'"),
+        ),
+    )
+
+    @staticmethod
+    def parse_id(user_id) -> t.Optional[uuid.UUID]:
+        """``user_id`` as a UUID, or None if it is not one (so callers can answer 404, not 500)."""
+        if isinstance(user_id, uuid.UUID):
+            return user_id
+        try:
+            return uuid.UUID(str(user_id))
+        except ValueError:
+            return None
+
+    @classmethod
+    def get_live(cls, user_id):
+        """Primary-key lookup that treats soft-deleted users as missing."""
+        # Identity-map keys are UUIDs; a str id would miss the map and re-SELECT every time.
+        user_id = cls.parse_id(user_id)
+        if user_id is None:
+            return None
+        user = db.session.get(cls, user_id)
+        if user is None or user.deleted_at is not None:
+            return None
+        return user
+
+    @classmethod
+    def live(cls):
+        return cls.query.filter(cls.deleted_at.is_(None))
+
+    def to_dict(self, fields: tuple = USER_FIELDS):
+        with phase("serialize"):
+            return user_serializer(fields)(self)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Enum
+from ..extensions import db
+from .types import GUID
+
+
+class ArchivedUser(db.Model):
+    """Cold storage for deleted and long-inactive accounts, moved out of ``users`` by the archiver."""
+
+    __tablename__ = "users_archive"
+
+    id = db.Column(GUID(), primary_key=True)
+    email = db.Column(db.String(255), nullable=False, index=True)
+    password_hash = db.Column(db.String(255), nullable=False)
+    full_name = db.Column(db.String(255), nullable=False)
+    role = db.Column(Enum("admin", "user", name="user_role"), nullable=False)
+    status = db.Column(Enum("active", "inactive", name="user_status"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    last_login_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
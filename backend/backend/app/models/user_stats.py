@@ -0,0 +1,14 @@
+from ..extensions import db
+
+
+class UserStat(db.Model):
+    """Incrementally maintained user aggregates.
+
+    Keys are ``total``, ``role:<role>``, ``status:<status>`` and
+    ``signups:<YYYY-MM-DD>``; see ``services.stats_service``.
+    """
+
+    __tablename__ = "user_stats"
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
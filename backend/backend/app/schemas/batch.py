@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+
+from ..core import typing as t
+
+
+ALLOWED_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+
+@dataclass
+class SubRequest:
+    id: str
+    method: str
+    path: str
+    body: t.Optional[dict] = None
+
+    @classmethod
+    def from_json(cls, data: dict, index: int):
+        if not isinstance(data, dict) or not data.get("path"):
+            raise ValueError(f"Request {index}: missing path")
+        method = str(data.get("method", "GET")).upper()
+        if method not in ALLOWED_METHODS:
+            raise ValueError(f"Request {index}: unsupported method {method}")
+        path = data["path"]
+        if not path.startswith("/api/") or path.split("?", 1)[0].rstrip("/") == "/api/batch":
+            raise ValueError(f"Request {index}: path must be an /api/ route other than /api/batch")
+        return cls(id=str(data.get("id", index)), method=method, path=path, body=data.get("body"))
+
+
+@dataclass
+class BatchInput:
+    requests: list[SubRequest] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data: dict, max_requests: int):
+        items = data.get("requests") if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValueError("Missing fields: requests")
+        if len(items) > max_requests:
+            raise ValueError(f"At most {max_requests} requests per batch")
+        return cls(requests=[SubRequest.from_json(item, i) for i, item in enumerate(items)])
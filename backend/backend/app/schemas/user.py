@@ -1,5 +1,9 @@
 from dataclasses import dataclass
 
+from ..core import typing as t
+
+from ..models.user import USER_FIELDS
+
 
 def require_fields(data: dict, fields: list[str]):
     missing = [f for f in fields if not data.get(f)]
@@ -31,3 +35,68 @@ class PasswordChangeInput:
     def from_json(cls, data: dict):
         require_fields(data, ["currentPassword", "newPassword"])
         return cls(current_password=data["currentPassword"], new_password=data["newPassword"])
+
+
+def parse_int(args, name: str, default=None):
+    raw = args.get(name)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def parse_fields(raw) -> tuple:
+    """Parse a ``fields=`` parameter into canonical ``USER_FIELDS`` order; ``id`` is always included."""
+    if not raw:
+        return USER_FIELDS
+    requested = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = requested - set(USER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(f for f in USER_FIELDS if f in requested)
+
+
+@dataclass
+class UserListQuery:
+    page: int
+    limit: int
+    count: str
+    fields: tuple = USER_FIELDS
+
+    @classmethod
+    def from_args(cls, args, count_modes):
+        count = args.get("count", "exact")
+        if count not in count_modes:
+            raise ValueError(f"count must be one of: {', '.join(count_modes)}")
+        return cls(
+            page=int(args.get("page", 1)),
+            limit=int(args.get("limit", 10)),
+            count=count,
+            fields=parse_fields(args.get("fields")),
+        )
+
+
+@dataclass
+class AuditEventQuery:
+    before: t.Optional[int]
+    limit: int
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(before=parse_int(args, "before"), limit=parse_int(args, "limit", 50))
+
+
+@dataclass
+class StatsQuery:
+    days: int
+
+    @classmethod
+    def from_args(cls, args):
+        days = parse_int(args, "days", 30)
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        # Longer windows are clamped to a year by the stats service.
+        return cls(days=days)
@@ -0,0 +1,68 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, insert, or_, select
+from ..extensions import db
+from ..models.user import User
+from ..models.user_archive import ArchivedUser
+from . import audit_service, stats_service, user_service
+
+
+def archivable_users(inactive_days: int) -> list:
+    """Soft-deleted users, plus users left inactive for ``inactive_days``.
+
+    One condition per partial index (``ix_users_deleted_at`` and
+    ``ix_users_inactive_updated_at``): an OR of the two would be a full scan.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=inactive_days)
+    return [User.deleted_at.isnot(None), and_(User.status == "inactive", User.updated_at < cutoff)]
+
+
+def archive_batch(inactive_days: int, batch_size: int = 500) -> int:
+    """Move one batch of archivable users into ``users_archive``; returns how many moved."""
+    conditions = archivable_users(inactive_days)
+    ids = []
+    for condition in conditions:
+        if len(ids) >= batch_size:
+            break
+        ids += [row[0] for row in db.session.query(User.id).filter(condition).limit(batch_size - len(ids))]
+    # A soft-deleted inactive user matches both conditions.
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return 0
+
+    # The candidates were read without locks; a user restored or reactivated since must stay put,
+    # so the conditions are checked again by the statement that removes the rows.
+    users = User.__table__
+    still_archivable = and_(users.c.id.in_(ids), or_(*conditions))
+    if db.engine.dialect.delete_returning:
+        rows = db.session.execute(delete(users).where(still_archivable).returning(*users.c)).mappings().all()
+    else:
+        rows = db.session.execute(select(*users.c).where(still_archivable).with_for_update()).mappings().all()
+        db.session.execute(delete(users).where(users.c.id.in_([row["id"] for row in rows])))
+    if not rows:
+        db.session.rollback()
+        return 0
+    db.session.execute(insert(ArchivedUser.__table__), [dict(row) for row in rows])
+
+    # Rows leave users via Core statements, so mirror what the ORM flush hooks would have done.
+    deltas = Counter()
+    for row in rows:
+        if row["deleted_at"] is None:
+            for key in stats_service.counter_keys(row["role"], row["status"]):
+                deltas[key] -= 1
+    stats_service.apply_deltas(db.session.connection(), deltas)
+    db.session.commit()
+    user_service.invalidate_user_count()
+
+    for row in rows:
+        audit_service.record("user.archived", row["id"])
+    return len(rows)
+
+
+def archive_users(inactive_days: int, batch_size: int = 500) -> int:
+    total = 0
+    while True:
+        moved = archive_batch(inactive_days, batch_size)
+        if not moved:
+            return total
+        total += moved
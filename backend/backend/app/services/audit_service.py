@@ -0,0 +1,43 @@
+from datetime import datetime
+from flask import abort, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from ..core import typing as t
+from ..extensions import audit_writer, db
+from ..models.audit_event import AuditEvent
+from ..models.user import User
+from ..models.user_archive import ArchivedUser
+
+
+def _current_identity():
+    if has_request_context() and g.get("_jwt_extended_jwt"):
+        return get_jwt_identity()
+    return None
+
+
+def record(action: str, user_id=None, actor_id=None, **details):
+    """Queue an audit event; the row is written asynchronously in a batch."""
+    audit_writer.submit({
+        "user_id": user_id,
+        "actor_id": actor_id if actor_id is not None else _current_identity(),
+        "action": action,
+        "ip_address": request.remote_addr if has_request_context() else None,
+        "details": details,
+        "created_at": datetime.utcnow(),
+    })
+
+
+def list_events(user_id: str, before: t.Optional[int] = None, limit: int = 50):
+    user_id = User.parse_id(user_id)
+    # Deleted and archived users keep their history; only ids that never existed are unknown.
+    if user_id is None or (db.session.get(User, user_id) is None and db.session.get(ArchivedUser, user_id) is None):
+        abort(404, description="User not found")
+    limit = min(max(limit, 1), 100)
+    query = AuditEvent.query.filter(AuditEvent.user_id == user_id)
+    if before is not None:
+        query = query.filter(AuditEvent.id < before)
+    items = query.order_by(AuditEvent.id.desc()).limit(limit).all()
+    return {
+        "items": [e.to_dict() for e in items],
+        "limit": limit,
+        "nextBefore": items[-1].id if len(items) == limit else None,
+    }
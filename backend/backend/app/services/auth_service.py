@@ -1,19 +1,31 @@
 from datetime import datetime
 from flask_jwt_extended import create_access_token
 from sqlalchemy.exc import IntegrityError
-from ..extensions import db
+from ..extensions import db, user_events, email_filter
 from ..models.user import User
 from ..core.security import hash_password, verify_password, validate_password_strength
+from . import audit_service
 
 
 class AuthError(Exception):
     pass
 
 
+def is_email_registered(email: str) -> bool:
+    email = email.lower()
+    if not email_filter.might_contain(email):
+        return False
+    # Filter hit: could be a false positive, confirm on the unique index (soft-deleted rows still hold the email).
+    return db.session.query(User.query.filter_by(email=email).exists()).scalar()
+
+
 def signup(full_name: str, email: str, password: str) -> tuple[User, str]:
     weakness = validate_password_strength(password)
     if weakness:
         raise AuthError(weakness)
+    # Reject known duplicates before paying for bcrypt; the commit below still catches races.
+    if is_email_registered(email):
+        raise AuthError("Email already registered")
 
     user = User(full_name=full_name, email=email.lower(), password_hash=hash_password(password))
     db.session.add(user)
@@ -22,19 +34,27 @@ def signup(full_name: str, email: str, password: str) -> tuple[User, str]:
     except IntegrityError:
         db.session.rollback()
         raise AuthError("Email already registered")
+    email_filter.add(user.email)
 
+    audit_service.record("auth.signup", user.id, actor_id=user.id)
+    user_events.publish("user.created", user.to_dict())
     token = create_access_token(identity=str(user.id))
     return user, token
 
 
 def login(email: str, password: str) -> tuple[User, str]:
-    user = User.query.filter_by(email=email.lower()).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = User.live().filter_by(email=email.lower()).first()
+    if not user:
+        raise AuthError("Invalid credentials")
+    if not verify_password(password, user.password_hash):
+        audit_service.record("auth.login_failed", user.id, actor_id=user.id, reason="invalid_credentials")
         raise AuthError("Invalid credentials")
     if user.status != "active":
+        audit_service.record("auth.login_failed", user.id, actor_id=user.id, reason="inactive")
         raise AuthError("Account is inactive")
 
     user.last_login_at = datetime.utcnow()
     db.session.commit()
+    audit_service.record("auth.login", user.id, actor_id=user.id)
     token = create_access_token(identity=str(user.id))
     return user, token
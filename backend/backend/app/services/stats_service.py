@@ -0,0 +1,124 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, select, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..extensions import db
+from ..models.user import User
+from ..models.user_archive import ArchivedUser
+from ..models.user_stats import UserStat
+
+
+def counter_keys(role, status):
+    return ["total", f"role:{role}", f"status:{status}"]
+
+
+def _history_pair(state, attr):
+    history = state.attrs[attr].history
+    old = history.deleted[0] if history.deleted else getattr(state.object, attr)
+    return old, getattr(state.object, attr)
+
+
+def collect_deltas(session: Session) -> Counter:
+    """Counter changes implied by pending User changes; only live (not soft-deleted) users count."""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, User):
+            day = (obj.created_at or datetime.utcnow()).date()
+            deltas[f"signups:{day.isoformat()}"] += 1
+            if obj.deleted_at is None:
+                for key in counter_keys(obj.role, obj.status):
+                    deltas[key] += 1
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        old_role, new_role = _history_pair(state, "role")
+        old_status, new_status = _history_pair(state, "status")
+        old_deleted, new_deleted = _history_pair(state, "deleted_at")
+        if old_deleted is None:
+            for key in counter_keys(old_role, old_status):
+                deltas[key] -= 1
+        if new_deleted is None:
+            for key in counter_keys(new_role, new_status):
+                deltas[key] += 1
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if _history_pair(state, "deleted_at")[0] is None:
+                for key in counter_keys(_history_pair(state, "role")[0], _history_pair(state, "status")[0]):
+                    deltas[key] -= 1
+    return Counter({k: v for k, v in deltas.items() if v})
+
+
+def apply_deltas(connection, deltas) -> None:
+    """Add ``deltas`` to the counters with a single upsert where the dialect allows it."""
+    if not deltas:
+        return
+    table = UserStat.__table__
+    rows = [{"key": key, "value": value} for key, value in sorted(deltas.items())]
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert_ = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert_(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key], set_={"value": table.c.value + stmt.excluded.value}
+        )
+        connection.execute(stmt)
+        return
+    for row in rows:
+        result = connection.execute(
+            update(table).where(table.c.key == row["key"]).values(value=table.c.value + row["value"])
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(row))
+
+
+# after_flush still sees the pre-flush new/dirty/deleted sets and attribute history,
+# with column defaults filled in. Writing on the flush's connection keeps counters in
+# the same transaction as the user change.
+@event.listens_for(Session, "after_flush")
+def _write_user_deltas(session, flush_context):
+    apply_deltas(session.connection(), collect_deltas(session))
+
+
+def rebuild() -> None:
+    """Recompute every counter from ``users`` (and ``users_archive`` for signups); use after bulk SQL that bypasses the ORM."""
+    deltas = Counter()
+    live = db.session.query(User.role, User.status, func.count()).filter(User.deleted_at.is_(None))
+    for role, status, count in live.group_by(User.role, User.status):
+        for key in counter_keys(role, status):
+            deltas[key] += count
+    # Signups are history: archived accounts still count on the day they joined.
+    for model in (User, ArchivedUser):
+        day = func.date(model.created_at)
+        for signup_day, count in db.session.query(day, func.count()).group_by(day):
+            deltas[f"signups:{signup_day}"] += count
+    db.session.execute(UserStat.__table__.delete())
+    apply_deltas(db.session.connection(), deltas)
+    db.session.commit()
+
+
+def get_stats(days: int = 30):
+    days = min(max(days, 1), 366)
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(UserStat.key, UserStat.value).where(
+            UserStat.key.in_(["total"]) | UserStat.key.like("role:%") | UserStat.key.like("status:%")
+            | UserStat.key.between(f"signups:{start.isoformat()}", f"signups:{today.isoformat()}")
+        )
+    ).all()
+    values = dict(rows)
+    by_role = {role: values.get(f"role:{role}", 0) for role in User.role.type.enums}
+    by_status = {status: values.get(f"status:{status}", 0) for status in User.status.type.enums}
+    signups = [
+        {"date": day.isoformat(), "count": values.get(f"signups:{day.isoformat()}", 0)}
+        for day in (start + timedelta(days=i) for i in range(days))
+    ]
+    return {
+        "total": values.get("total", 0),
+        "byRole": by_role,
+        "byStatus": by_status,
+        "signupsPerDay": signups,
+    }
@@ -1,36 +1,141 @@
+from datetime import datetime
+from itertools import chain
 from math import ceil
-from flask import abort
+from flask import abort, current_app
+from sqlalchemy import event, inspect, text
 from sqlalchemy.exc import IntegrityError
-from ..extensions import db
-from ..models.user import User
+from sqlalchemy.orm import Session
+from ..extensions import db, jwt, permissions, user_events, email_filter
+from ..models.user import User, USER_FIELDS, user_serializer
+from ..core.cache import TTLValue
+from ..core.profiling import phase
 from ..core.security import hash_password, verify_password, validate_password_strength
+from . import audit_service
 
 
-def list_users(page: int = 1, limit: int = 10):
+COUNT_MODES = ("exact", "estimated", "none")
+
+_exact_count = TTLValue()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_user_count_change(session, flush_context):
+    changed = any(isinstance(obj, User) for obj in chain(session.new, session.deleted)) or any(
+        isinstance(obj, User)
+        and (inspect(obj).attrs.status.history.has_changes() or inspect(obj).attrs.deleted_at.history.has_changes())
+        for obj in session.dirty
+    )
+    if changed:
+        session.info["user_count_changed"] = True
+
+
+# Invalidate only once the change is visible: a recount between flush and commit would cache the old total.
+@event.listens_for(Session, "after_commit")
+def _invalidate_user_count(session):
+    if session.info.pop("user_count_changed", False):
+        invalidate_user_count()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_count_change(session):
+    session.info.pop("user_count_changed", None)
+
+
+def invalidate_user_count():
+    """Drop this worker's cached exact total; needed after Core statements that bypass the ORM."""
+    _exact_count.invalidate()
+
+
+def _count_users(mode: str):
+    if mode == "none":
+        return None
+    if mode == "estimated" and db.engine.dialect.name == "postgresql":
+        # Planner statistics: free to read, refreshed by autovacuum/ANALYZE. -1 means never analyzed.
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return _exact_count.get(lambda: User.live().count(), ttl=current_app.config.get("USER_COUNT_CACHE_TTL", 30))
+
+
+def list_users(page: int = 1, limit: int = 10, count: str = "exact", fields: tuple = USER_FIELDS):
     page = max(page, 1)
     limit = max(limit, 1)
-    query = User.query.order_by(User.created_at.desc())
-    total = query.count()
-    items = query.offset((page - 1) * limit).limit(limit).all()
+    serialize = user_serializer(fields)
+    # Project only the requested columns: plain rows, no ORM instances to build or track.
+    query = User.live().with_entities(*serialize.columns()).order_by(User.created_at.desc())
+    # One extra row tells us whether a next page exists without needing the total.
+    rows = query.offset((page - 1) * limit).limit(limit + 1).all()
+    items, has_more = rows[:limit], len(rows) > limit
+    total = _count_users(count)
+    # Estimates can lag behind the rows actually seen; never report fewer pages than we know exist.
+    seen = page + 1 if has_more else (page if items else 0)
+    pages = seen if total is None else max(ceil(total / limit), seen)
+    with phase("serialize"):
+        items = [serialize(row) for row in items]
     return {
-        "items": [u.to_dict() for u in items],
+        "items": items,
         "page": page,
         "limit": limit,
         "total": total,
-        "pages": ceil(total / limit) if limit else 0,
+        "pages": pages,
+        "count": count,
+        "hasMore": has_more,
     }
 
 
 def set_status(user_id: str, status: str):
-    user = db.session.get(User, user_id)
+    user = User.get_live(user_id)
     if not user:
         abort(404, description="User not found")
+    previous = user.status
     user.status = status
     db.session.commit()
+    audit_service.record("user.status_changed", user.id, previous=previous, status=status)
+    if previous != status:
+        user_events.publish("user.activated" if status == "active" else "user.deactivated", user.to_dict())
+    # Admin access is cut by the permission cache; dropping cached decodes only frees their slots.
+    permissions.invalidate(user.id)
+    if status != "active":
+        jwt.token_cache.invalidate_identity(user.id)
+    return user
+
+
+def soft_delete(user_id: str, actor_id: str):
+    user = User.get_live(user_id)
+    if not user:
+        abort(404, description="User not found")
+    if str(user.id) == str(actor_id):
+        abort(400, description="You cannot delete your own account")
+    user.deleted_at = datetime.utcnow()
+    db.session.commit()
+    audit_service.record("user.deleted", user.id)
+    user_events.publish("user.deleted", {"id": str(user.id)})
+    jwt.token_cache.invalidate_identity(user.id)
+    permissions.invalidate(user.id)
+    return user
+
+
+def restore(user_id: str):
+    user_id = User.parse_id(user_id)
+    user = db.session.get(User, user_id) if user_id is not None else None
+    if not user or user.deleted_at is None:
+        abort(404, description="Deleted user not found")
+    user.deleted_at = None
+    db.session.commit()
+    audit_service.record("user.restored", user.id)
+    user_events.publish("user.restored", user.to_dict())
+    permissions.invalidate(user.id)
     return user
 
 
 def update_profile(user: User, full_name: str, email: str):
+    changed = []
+    if user.full_name != full_name:
+        changed.append("fullName")
+    if user.email != email.lower():
+        changed.append("email")
     user.full_name = full_name
     user.email = email.lower()
     try:
@@ -38,6 +143,11 @@ def update_profile(user: User, full_name: str, email: str):
     except IntegrityError:
         db.session.rollback()
         abort(400, description="Email already in use")
+    if "email" in changed:
+        email_filter.add(user.email)
+    if changed:
+        audit_service.record("user.profile_updated", user.id, fields=changed)
+        user_events.publish("user.updated", user.to_dict())
     return user
 
 
@@ -49,3 +159,4 @@ def change_password(user: User, current_password: str, new_password: str):
         abort(400, description=weakness)
     user.password_hash = hash_password(new_password)
     db.session.commit()
+    audit_service.record("user.password_changed", user.id)
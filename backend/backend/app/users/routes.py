@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from ..extensions import db
+from ..extensions import user_events
 from ..models.user import User
-from ..core.decorators import role_required
-from ..schemas.user import ProfileUpdateInput, PasswordChangeInput
-from ..services import user_service
+from ..core.decorators import permission_required
+from ..schemas.user import ProfileUpdateInput, PasswordChangeInput, UserListQuery, AuditEventQuery, StatsQuery, parse_fields
+from ..services import user_service, audit_service, stats_service
 
 
 users_bp = Blueprint("users", __name__)
@@ -13,17 +16,74 @@ users_bp = Blueprint("users", __name__)
 
 @users_bp.route("/users", methods=["GET"])
 @jwt_required()
-@role_required("admin")
+@permission_required("users:list")
 def list_users():
-    page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 10))
-    data = user_service.list_users(page=page, limit=limit)
+    try:
+        params = UserListQuery.from_args(request.args, user_service.COUNT_MODES)
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
+    data = user_service.list_users(page=params.page, limit=params.limit, count=params.count, fields=params.fields)
     return jsonify(data)
 
 
+@users_bp.route("/users/stats", methods=["GET"])
+@jwt_required()
+@permission_required("users:stats")
+def user_stats():
+    try:
+        params = StatsQuery.from_args(request.args)
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
+    return jsonify(stats_service.get_stats(days=params.days))
+
+
+def _event_stream(subscription, heartbeat: float, max_seconds: float):
+    # Browsers reconnect automatically; tell them to wait 5s first.
+    yield "retry: 5000\n\n"
+    # Streams end periodically so reconnects rebalance clients across workers.
+    deadline = time.monotonic() + max_seconds
+    while time.monotonic() < deadline:
+        event = subscription.get(timeout=heartbeat)
+        if subscription.overflowed:
+            # We dropped events for this client; it should refetch rather than trust its table.
+            subscription.overflowed = False
+            yield "event: resync\ndata: {}\n\n"
+        if event is None:
+            yield ": keepalive\n\n"
+            continue
+        yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+# EventSource cannot set headers, so the token may also come as ?jwt=<token>.
+@users_bp.route("/users/events", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+@permission_required("users:events")
+def user_events_stream():
+    # Subscribe before returning so nothing published between now and the first read is lost.
+    subscription = user_events.subscribe()
+    if subscription is None:
+        response = jsonify({"error": {"code": "overloaded", "message": "Too many open event streams, retry shortly"}})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(current_app.config["EVENTS_RETRY_AFTER"])
+        return response
+    stream = _event_stream(
+        subscription,
+        heartbeat=current_app.config["EVENTS_HEARTBEAT_SECONDS"],
+        max_seconds=current_app.config["EVENTS_STREAM_MAX_SECONDS"],
+    )
+    response = Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs on disconnect too, even if the stream was never iterated.
+    response.call_on_close(subscription.close)
+    return response
+
+
 @users_bp.route("/users/<user_id>/activate", methods=["POST"])
 @jwt_required()
-@role_required("admin")
+@permission_required("users:manage")
 def activate_user(user_id):
     user = user_service.set_status(user_id, "active")
     return jsonify(user.to_dict())
@@ -31,20 +91,52 @@ def activate_user(user_id):
 
 @users_bp.route("/users/<user_id>/deactivate", methods=["POST"])
 @jwt_required()
-@role_required("admin")
+@permission_required("users:manage")
 def deactivate_user(user_id):
     user = user_service.set_status(user_id, "inactive")
     return jsonify(user.to_dict())
 
 
+@users_bp.route("/users/<user_id>", methods=["DELETE"])
+@jwt_required()
+@permission_required("users:delete")
+def delete_user(user_id):
+    user_service.soft_delete(user_id, actor_id=get_jwt_identity())
+    return jsonify({"message": "User deleted"})
+
+
+@users_bp.route("/users/<user_id>/restore", methods=["POST"])
+@jwt_required()
+@permission_required("users:restore")
+def restore_user(user_id):
+    user = user_service.restore(user_id)
+    return jsonify(user.to_dict())
+
+
+@users_bp.route("/users/<user_id>/audit", methods=["GET"])
+@jwt_required()
+@permission_required("audit:read")
+def user_audit_events(user_id):
+    try:
+        params = AuditEventQuery.from_args(request.args)
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
+    data = audit_service.list_events(user_id, before=params.before, limit=params.limit)
+    return jsonify(data)
+
+
 @users_bp.route("/profile", methods=["GET"])
 @jwt_required()
 def profile():
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as err:
+        return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
     user_id = get_jwt_identity()
-    user = db.session.get(User, user_id)
+    user = User.get_live(user_id)
     if not user:
         return jsonify({"error": {"code": "not_found", "message": "User not found"}}), 404
-    return jsonify(user.to_dict())
+    return jsonify(user.to_dict(fields))
 
 
 @users_bp.route("/profile", methods=["PUT"])
@@ -56,7 +148,7 @@ def update_profile():
         return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
 
     user_id = get_jwt_identity()
-    user = db.session.get(User, user_id)
+    user = User.get_live(user_id)
     if not user:
         return jsonify({"error": {"code": "not_found", "message": "User not found"}}), 404
 
@@ -73,7 +165,7 @@ def update_password():
         return jsonify({"error": {"code": "validation_error", "message": str(err)}}), 400
 
     user_id = get_jwt_identity()
-    user = db.session.get(User, user_id)
+    user = User.get_live(user_id)
     if not user:
         return jsonify({"error": {"code": "not_found", "message": "User not found"}}), 404
 
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Measure per-request JWT verification cost with and without the decode cache"""
+import sys
+import time
+sys.path.insert(0, '.')
+
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import jwt
+
+ITERATIONS = 20000
+
+
+def run(app, token, iterations):
+    headers = {'Authorization': f'Bearer {token}'}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with app.test_request_context('/api/profile', headers=headers):
+            verify_jwt_in_request()
+    return (time.perf_counter() - start) / iterations
+
+
+def measure_context_only(app, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with app.test_request_context('/api/profile'):
+            pass
+    return (time.perf_counter() - start) / iterations
+
+
+app = create_app(TestingConfig)
+
+with app.app_context():
+    token = create_access_token(identity='00000000-0000-0000-0000-000000000000')
+
+baseline = measure_context_only(app, ITERATIONS)
+
+jwt.token_cache.maxsize = 0
+uncached = run(app, token, ITERATIONS) - baseline
+
+jwt.token_cache.maxsize = 1024
+jwt.token_cache.clear()
+cached = run(app, token, ITERATIONS) - baseline
+
+print("=" * 60)
+print("JWT VERIFICATION COST PER REQUEST")
+print("=" * 60)
+print(f"Iterations:        {ITERATIONS}")
+print(f"Without cache:     {uncached * 1e6:8.2f} us")
+print(f"With cache:        {cached * 1e6:8.2f} us")
+print(f"Speedup:           {uncached / cached:8.2f}x")
+print(f"Cache hits/misses: {jwt.token_cache.hits}/{jwt.token_cache.misses}")
+print("=" * 60)
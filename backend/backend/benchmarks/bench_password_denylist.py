@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Measure breached-password lookups against a memory-mapped denylist"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, '.')
+
+from app.core.password_denylist import PasswordDenylist, build_denylist
+
+ENTRIES = 2_000_000
+LOOKUPS = 100_000
+
+path = os.path.join(tempfile.mkdtemp(), 'breached.bin')
+
+start = time.perf_counter()
+count = build_denylist((f'password{i}'.encode() for i in range(ENTRIES)), path)
+build_seconds = time.perf_counter() - start
+
+denylist = PasswordDenylist()
+denylist.path = path
+len(denylist)  # map the file before timing
+
+probes = [f'password{random.randrange(ENTRIES * 2)}' for _ in range(LOOKUPS)]
+start = time.perf_counter()
+found = sum(denylist.contains(p) for p in probes)
+lookup = (time.perf_counter() - start) / LOOKUPS
+
+print("=" * 60)
+print("BREACHED PASSWORD DENYLIST")
+print("=" * 60)
+print(f"Entries:           {count}")
+print(f"File size:         {os.path.getsize(path) / 1e6:8.2f} MB")
+print(f"Build time:        {build_seconds:8.2f} s")
+print(f"Lookup:            {lookup * 1e6:8.2f} us")
+print(f"Hits:              {found}/{LOOKUPS}")
+print("=" * 60)
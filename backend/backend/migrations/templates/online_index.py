@@ -0,0 +1,44 @@
+"""<message>
+
+Template for migrations that touch the live users table. Copy it into
+versions/, or paste the body into a revision from `flask db revision -m "..."`,
+then fill in the identifiers.
+
+Revision ID: <revision>
+Revises: <down_revision>
+Create Date: <date>
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.online_migrations import backfill, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '<revision>'
+down_revision = '<down_revision>'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1. Add columns as nullable with no default: a metadata-only change, no table rewrite.
+    op.add_column('users', sa.Column('email_domain', sa.String(length=255), nullable=True))
+
+    # 2. Fill them in short committed batches; the WHERE guard makes an interrupted run resumable.
+    backfill(
+        'users',
+        "email_domain = substr(email, instr(email, '@') + 1)",
+        where='email_domain IS NULL',
+        batch_size=1000,
+        pause=0.1,
+    )
+
+    # 3. Build indexes without blocking writes (CONCURRENTLY on PostgreSQL, plain on SQLite).
+    create_index_concurrently('ix_users_email_domain', 'users', ['email_domain'], where='deleted_at IS NULL')
+
+
+def downgrade():
+    drop_index_concurrently('ix_users_email_domain', 'users')
+    op.drop_column('users', 'email_domain')
@@ -0,0 +1,35 @@
+"""Add audit events
+
+Revision ID: 3f9c2a7d41b8
+Revises: e530b26b83a7
+Create Date: 2026-10-19 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d41b8'
+down_revision = 'e530b26b83a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_events',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('actor_id', sa.UUID(), nullable=True),
+    sa.Column('action', sa.String(length=64), nullable=False),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_events_user_id_id', 'audit_events', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_audit_events_user_id_id', table_name='audit_events')
+    op.drop_table('audit_events')
@@ -0,0 +1,37 @@
+"""Add user stats aggregates
+
+Revision ID: 8b1e6d0c52f4
+Revises: 3f9c2a7d41b8
+Create Date: 2026-10-19 11:03:27.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e6d0c52f4'
+down_revision = '3f9c2a7d41b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+    # One-off backfill; afterwards the counters are maintained incrementally.
+    op.execute("INSERT INTO user_stats (key, value) SELECT 'total', count(*) FROM users")
+    op.execute("INSERT INTO user_stats (key, value) SELECT 'role:' || role, count(*) FROM users GROUP BY role")
+    op.execute("INSERT INTO user_stats (key, value) SELECT 'status:' || status, count(*) FROM users GROUP BY status")
+    op.execute(
+        "INSERT INTO user_stats (key, value) "
+        "SELECT 'signups:' || date(created_at), count(*) FROM users GROUP BY date(created_at)"
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
@@ -0,0 +1,26 @@
+"""Index soft-deleted users for the archiver
+
+Revision ID: a6d3f0b9e725
+Revises: f2c8e6a1b374
+Create Date: 2026-10-19 21:08:13.274911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3f0b9e725'
+down_revision = 'f2c8e6a1b374'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_users_deleted_at', 'users', ['deleted_at'], where='deleted_at IS NOT NULL')
+
+
+def downgrade():
+    drop_index_concurrently('ix_users_deleted_at', 'users')
@@ -0,0 +1,55 @@
+"""Soft delete and users archive
+
+Revision ID: c47a9e2f8d13
+Revises: 8b1e6d0c52f4
+Create Date: 2026-10-19 13:41:09.552870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a9e2f8d13'
+down_revision = '8b1e6d0c52f4'
+branch_labels = None
+depends_on = None
+
+
+def _enum(*values, name):
+    # The PostgreSQL types already exist from the users table.
+    return sa.Enum(*values, name=name).with_variant(postgresql.ENUM(*values, name=name, create_type=False), 'postgresql')
+
+
+def upgrade():
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_users_live_created_at', 'users', ['created_at'], unique=False,
+        postgresql_where=sa.text('deleted_at IS NULL'),
+        sqlite_where=sa.text('deleted_at IS NULL'),
+    )
+
+    op.create_table('users_archive',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=False),
+    sa.Column('role', _enum('admin', 'user', name='user_role'), nullable=False),
+    sa.Column('status', _enum('active', 'inactive', name='user_status'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('last_login_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_archive_email', 'users_archive', ['email'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_archive_email', table_name='users_archive')
+    op.drop_table('users_archive')
+    op.drop_index('ix_users_live_created_at', table_name='users')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
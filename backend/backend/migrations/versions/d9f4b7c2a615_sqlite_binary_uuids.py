@@ -0,0 +1,49 @@
+"""Store UUIDs as 16-byte blobs on SQLite
+
+Revision ID: d9f4b7c2a615
+Revises: c47a9e2f8d13
+Create Date: 2026-10-19 16:02:37.118204
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f4b7c2a615'
+down_revision = 'c47a9e2f8d13'
+branch_labels = None
+depends_on = None
+
+# SQLite columns are dynamically typed, so only the stored values change; PostgreSQL keeps native uuid.
+GUID_COLUMNS = {
+    'users': ('id',),
+    'users_archive': ('id',),
+    'audit_events': ('user_id', 'actor_id'),
+}
+BATCH_SIZE = 1000
+
+
+def _convert(stored_type, to_value):
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    for table, columns in GUID_COLUMNS.items():
+        for column in columns:
+            select = sa.text(f'SELECT rowid, {column} FROM {table} WHERE typeof({column}) = :stored LIMIT {BATCH_SIZE}')
+            update = sa.text(f'UPDATE {table} SET {column} = :value WHERE rowid = :rowid')
+            while True:
+                rows = conn.execute(select, {'stored': stored_type}).fetchall()
+                if not rows:
+                    break
+                conn.execute(update, [{'rowid': rowid, 'value': to_value(value)} for rowid, value in rows])
+
+
+def upgrade():
+    _convert('text', lambda value: uuid.UUID(value).bytes)
+
+
+def downgrade():
+    _convert('blob', lambda value: uuid.UUID(bytes=bytes(value)).hex)
@@ -0,0 +1,26 @@
+"""Index inactive users for the archiver
+
+Revision ID: f2c8e6a1b374
+Revises: d9f4b7c2a615
+Create Date: 2026-10-19 17:24:51.603318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8e6a1b374'
+down_revision = 'd9f4b7c2a615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_users_inactive_updated_at', 'users', ['updated_at'], where="status = 'inactive'")
+
+
+def downgrade():
+    drop_index_concurrently('ix_users_inactive_updated_at', 'users')
@@ -110,6 +110,11 @@ export const authService = {
     }
   },
 
+  checkEmailAvailable: async (email) => {
+    const response = await api.get('/auth/email-available', { params: { email } });
+    return response.data.available;
+  },
+
   getToken: () => {
     return localStorage.getItem('token');
   },
@@ -2,9 +2,11 @@ import api from './authService';
 
 export const userService = {
   // Get all users with pagination (Admin only)
-  getAllUsers: async (page = 1, limit = 10) => {
+  // Pass fields (e.g. ['fullName', 'email', 'status']) to receive only those columns.
+  getAllUsers: async (page = 1, limit = 10, fields = null) => {
     try {
-      const response = await api.get(`/users?page=${page}&limit=${limit}`);
+      const fieldsParam = fields ? `&fields=${fields.join(',')}` : '';
+      const response = await api.get(`/users?page=${page}&limit=${limit}${fieldsParam}`);
       return response.data;
     } catch (error) {
       console.error('Error fetching users:', error);
@@ -12,6 +14,35 @@ export const userService = {
     }
   },
 
+  // Get user counts by role/status and signups per day (Admin only)
+  getStats: async (days = 30) => {
+    try {
+      const response = await api.get(`/users/stats?days=${days}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching user stats:', error);
+      throw error;
+    }
+  },
+
+  // Load current user, profile and first users page in one round trip.
+  // Returns { me, profile, users }; users holds an { error } object for non-admins.
+  getDashboard: async (page = 1, limit = 10) => {
+    try {
+      const response = await api.post('/batch', {
+        requests: [
+          { id: 'me', path: '/api/auth/me' },
+          { id: 'profile', path: '/api/profile' },
+          { id: 'users', path: `/api/users?page=${page}&limit=${limit}` },
+        ],
+      });
+      return Object.fromEntries(response.data.responses.map((r) => [r.id, r.body]));
+    } catch (error) {
+      console.error('Error fetching dashboard:', error);
+      throw error;
+    }
+  },
+
   // Get current user profile
   getProfile: async () => {
     try {
@@ -69,4 +100,52 @@ export const userService = {
       throw error;
     }
   },
+
+  // Soft-delete user
+  deleteUser: async (userId) => {
+    try {
+      const response = await api.delete(`/users/${userId}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error deleting user:', error);
+      throw error;
+    }
+  },
+
+  // Subscribe to live user changes (Admin only). handlers maps event types such as
+  // 'user.created', 'user.activated', 'user.deactivated', 'user.updated' or 'resync'
+  // to callbacks. Returns a function that closes the stream.
+  subscribeToUserEvents: (handlers) => {
+    const token = localStorage.getItem('token');
+    let source = null;
+    let retryTimer = null;
+    let reconnecting = false;
+    let closed = false;
+
+    const connect = () => {
+      source = new EventSource(`${api.defaults.baseURL}/users/events?jwt=${encodeURIComponent(token)}`);
+      Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+      });
+      source.onopen = () => {
+        // Events published while we were disconnected are lost; reload the table.
+        if (reconnecting && handlers.resync) handlers.resync({});
+      };
+      source.onerror = () => {
+        // EventSource retries dropped streams itself but gives up on an error status such as
+        // the 503 sent when the server's stream slots are full; try again later ourselves.
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          reconnecting = true;
+          retryTimer = setTimeout(connect, 30000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      source.close();
+    };
+  },
 };